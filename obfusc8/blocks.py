@@ -18,15 +18,30 @@ from obfusc8.toposort import toposort_flatten
 #------- Blocks ------------
 
 class Block(object):
-	"""Super class for all building blocks, should never be instanciated"""
+	"""Super class for all building blocks, should never be instanciated
 	
-	def __init__(self, inputs):
+	notGates maps gate ids to the NotGate negating that gate. Blocks
+	hand it down to their sub blocks so that a wire which is used by
+	several blocks (e.g. a circuit input) is only negated once.
+	"""
+	
+	def __init__(self, inputs, notGates=None):
 		self.inputs = inputs
+		self.notGates = {} if notGates is None else notGates
 
 	def extractCircuit(self):
 		"""Takes the block inputs and generates the correct wirings to the block output(s)"""
 		
 		pass
+	
+	def negate(self, gate):
+		"""Return a (possibly shared) NotGate with gate as input"""
+		
+		try:
+			ret = self.notGates[gate.id]
+		except KeyError:
+			ret = self.notGates[gate.id] = NotGate(gate)
+		return ret
 
 class SimBlock(Block):
 	"""Simulates one gate of the original circuit.
@@ -35,9 +50,9 @@ class SimBlock(Block):
 	and a control input c0 which decides what kind of gate should be simulated.
 	c0 = 0 -> NotGate, c0 = 1 -> AndGate
 	"""
-	def __init__(self, inputs):
+	def __init__(self, inputs, notGates=None):
 		assert(len(inputs) == 2)
-		super(SimBlock, self).__init__(inputs)
+		super(SimBlock, self).__init__(inputs, notGates)
 
 	def extractCircuit(self):
 		c0 = Control()
@@ -45,20 +60,20 @@ class SimBlock(Block):
 		#-(in0 & -in1) & -(in0 & -c0) & -(-in0 & c0)
 
 		# a1: -(in0 & -in1)
-		a1 = NotGate(AndGate(self.inputs[0], NotGate(self.inputs[1])))
+		a1 = NotGate(AndGate(self.inputs[0], self.negate(self.inputs[1])))
 		# a2: -(in0 & -c0)
 		a2 = NotGate(AndGate(self.inputs[0], NotGate(c0)))
 		# a3: -(-in0 & c0)
-		a3 = NotGate(AndGate(NotGate(self.inputs[0]), c0))
+		a3 = NotGate(AndGate(self.negate(self.inputs[0]), c0))
 
 		return (AndGate(AndGate(a1, a2), a3), [c0])
 	
 class YBlock(Block):
 	"""Outputs in0 or in1 depending on the value of c0."""
 	
-	def __init__(self, inputs):
+	def __init__(self, inputs, notGates=None):
 		assert(len(inputs) == 2)
-		super(YBlock, self).__init__(inputs)
+		super(YBlock, self).__init__(inputs, notGates)
 
 	def extractCircuit(self):
 		c0 = Control()
@@ -66,29 +81,29 @@ class YBlock(Block):
 		#-(-c0 & -in0) & -(c0 & -in1)
 
 		#a1: -(-c0 & -in0)
-		a1 = NotGate(AndGate(NotGate(c0), NotGate(self.inputs[0])))
+		a1 = NotGate(AndGate(NotGate(c0), self.negate(self.inputs[0])))
 		#a2: -(c0 & -in1)
-		a2 = NotGate(AndGate(c0, NotGate(self.inputs[1])))
+		a2 = NotGate(AndGate(c0, self.negate(self.inputs[1])))
 
 		return (AndGate(a1, a2), [c0])
 
 class S_u_1(Block):
 	"""Outputs one of the u inputs depending on the control values."""
 	
-	def __init__(self, u, inputs):
+	def __init__(self, u, inputs, notGates=None):
 		assert(len(inputs) == u)
 		self.u = u
-		super(S_u_1, self).__init__(inputs)
+		super(S_u_1, self).__init__(inputs, notGates)
 
 	def extractCircuit(self):
 		if self.u==1: return (self.inputs[0], [])
 		#first YBlock takes two inputs as input
-		last = YBlock(self.inputs[0:2])
+		last = YBlock(self.inputs[0:2], self.notGates)
 		lastOut, controls = last.extractCircuit()
 		for input in self.inputs[2:]:
 			#every other YBlock takes first the output of the preceding YBlock and another input
 			newInputs = [lastOut, input]
-			last = YBlock(newInputs)
+			last = YBlock(newInputs, self.notGates)
 			lastOut, ctrl = last.extractCircuit()
 			#collect all control inputs
 			controls += ctrl
@@ -98,10 +113,10 @@ class S_u_1(Block):
 	def getControlValues(u, n):
 		assert(u>0)
 		assert(n<u)
-		if u==0: return []
-		if n<=0: return (u-1)*[0]
+		ret = [0]*(u-1)
 		#to pass input[n] to the output gate the (n-1)th control has to be one
-		return [0]*(n-1)+[1]+[0]*(u-1-n)
+		if n>0: ret[n-1] = 1
+		return ret
 
 class S_u_v(Block):
 	"""Selection block with u inputs and v outputs.
@@ -109,11 +124,11 @@ class S_u_v(Block):
 	Each of the outputs can take the value of one of the inputs.
 	Naively constructed from v S_u_1 blocks.
 	"""
-	def __init__(self, u, v, inputs):
+	def __init__(self, u, v, inputs, notGates=None):
 		assert(len(inputs) == u)
 		self.u = u
 		self.v = v
-		super(S_u_v, self).__init__(inputs)
+		super(S_u_v, self).__init__(inputs, notGates)
 
 	def extractCircuit(self):
 		"""!!! Attention! Special case: returns a list of outputs !!!"""
@@ -121,8 +136,10 @@ class S_u_v(Block):
 		logging.info('Extracting S_u_v Circuit')
 		outputs = []
 		controls = []
+		#built one after another on purpose: constructing gates is pure Python and
+		#bound by the GIL, and all chains share the negations in self.notGates
 		for i in range(self.v):
-			su1 = S_u_1(self.u, self.inputs)
+			su1 = S_u_1(self.u, self.inputs, self.notGates)
 			su1Out, su1Ctrl = su1.extractCircuit()
 			#collect outputs and control inputs
 			outputs.append(su1Out)
@@ -133,9 +150,10 @@ class S_u_v(Block):
 	def getControlValues(u, nList):
 		assert(u>0)
 		assert(all(n<u for n in nList))
-		ret = []
-		for n in nList:
-			ret += S_u_1.getControlValues(u, n)
+		#same as concatenating S_u_1.getControlValues(u, n) for all n, without the intermediate lists
+		ret = [0]*((u-1)*len(nList))
+		for pos, n in enumerate(nList):
+			if n>0: ret[pos*(u-1)+n-1] = 1
 
 		return ret
 
@@ -145,31 +163,33 @@ class U_k(Block):
 	Has 2k inputs as this is the maximum for a circuit with k gates.
 	There are some restrictions on the input structure for each gate.
 	"""
-	def __init__(self, k, inputs):
+	def __init__(self, k, inputs, notGates=None):
 		assert(len(inputs) == 2*k)
 		self.k = k
-		super(U_k, self).__init__(inputs)
+		super(U_k, self).__init__(inputs, notGates)
 
 	def extractCircuit(self):
 		logging.info('Extracting U_K Circuit')
 		
-		#outputs of each SimGate in order
-		outputs = []
+		#outputs of each SimGate in order, the first i are set before step i
+		outputs = [None]*self.k
 		#controls for G1, S21, S21, G2, S31, S31, ...
 		controls = []
 		for i in range(self.k):
 			#left S Block
-			sl = S_u_1(i+1, [self.inputs[2*i]]+outputs)
+			sl = S_u_1(i+1, [self.inputs[2*i]]+outputs[:i], self.notGates)
 			slOut, slCtrl = sl.extractCircuit()
 			#right S Block
-			sr = S_u_1(i+1, [self.inputs[2*i+1]]+outputs)
+			sr = S_u_1(i+1, [self.inputs[2*i+1]]+outputs[:i], self.notGates)
 			srOut, srCtrl = sr.extractCircuit()
 			#G_i
-			sim = SimBlock([slOut,srOut])
+			sim = SimBlock([slOut,srOut], self.notGates)
 			simOut, simCtrl = sim.extractCircuit()
 
-			outputs += [simOut]
-			controls += slCtrl+srCtrl+simCtrl
+			outputs[i] = simOut
+			controls.extend(slCtrl)
+			controls.extend(srCtrl)
+			controls.extend(simCtrl)
 
 		#only return last output as branching programs only support one output anyways
 		return (outputs[-1], controls)
@@ -177,22 +197,22 @@ class U_k(Block):
 class UCBlock(Block):
 	"""Universal Block that lifts the restrictions that the U_k block has on the input structure."""
 	
-	def __init__(self, u, v, k, inputs):
+	def __init__(self, u, v, k, inputs, notGates=None):
 		#v always 1
 		assert(v==1)
 		assert(u==len(inputs))
 		self.u = u
 		self.v = v
 		self.k = k
-		super(UCBlock, self).__init__(inputs)
+		super(UCBlock, self).__init__(inputs, notGates)
 	
 	def extractCircuit(self):
 		logging.info('Extracting UCBlock Circuit')
 		
-		sin = S_u_v(self.u, 2*self.k, self.inputs)
+		sin = S_u_v(self.u, 2*self.k, self.inputs, self.notGates)
 		sinOut, sinCtrl = sin.extractCircuit()
 
-		u = U_k(self.k, sinOut)
+		u = U_k(self.k, sinOut, self.notGates)
 		uOut, uCtrl = u.extractCircuit()
 
 		return uOut, sinCtrl+uCtrl
@@ -229,6 +249,8 @@ class UniversalCircuit(Circuit):
 			if type == 0: s, y = (6, 5)
 			elif type == 1: s, y = (5, 3)
 			ret = 2*y*self.u*self.k + y*self.k**2 + (s-3*y)*self.k
+			#negations of the inputs and of the gate outputs are shared between the selection blocks
+			if type == 0: ret -= (2*self.k-1)*self.u + (self.k-1)**2
 		return ret
 	
 	@classmethod
@@ -247,6 +269,9 @@ class UniversalCircuit(Circuit):
 		#topological order
 		tOrd = toposort_flatten(dep, sort=True)
 		logging.debug('Topological Order: %s', tOrd)
+		
+		#position of each gate in the topological order
+		tPos = dict((id, pos) for pos, id in enumerate(tOrd))
 
 		#datastructure to access gates via id
 		gates = circuit.getDict()
@@ -260,26 +285,26 @@ class UniversalCircuit(Circuit):
 		simList = [[gates[id].getType()] for id in tOrd]
 
 		#traverse each gate in topological order
-		counter = 0
-		for id in tOrd:
+		for counter, id in enumerate(tOrd):
+			gate = gates[id]
 			#for all lists: if don't care simply leave -1
 			#slList
-			if gates[id].input1.getType() == -1:
+			input1 = gate.input1
+			if input1.getType() == -1:
 				#is input -> connect pos 0 & program S_u_v selektor to pos
 				slList[counter] = 0
-				suvList[2*counter] = gates[id].input1.pos
+				suvList[2*counter] = input1.pos
 			else:
 				#is another gate (prior in topological order) -> obtain its position in topo order, selektor value = 1+position
-				slList[counter] = 1+tOrd.index(gates[id].input1.id)
-			#same for srList
-			try:
-				if gates[id].input2.getType() == -1:
+				slList[counter] = 1+tPos[input1.id]
+			#same for srList, NotGates only have one input
+			if gate.getType() == 1:
+				input2 = gate.input2
+				if input2.getType() == -1:
 					srList[counter] = 0
-					suvList[2*counter+1] = gates[id].input2.pos
+					suvList[2*counter+1] = input2.pos
 				else:
-					srList[counter] = 1+tOrd.index(gates[id].input2.id)
-			except AttributeError: pass
-			counter += 1
+					srList[counter] = 1+tPos[input2.id]
 
 		logging.debug('simList: %s', simList)
 		logging.debug('slList: %s', slList)
@@ -328,7 +353,7 @@ if __name__ == '__main__':
 	print 'S2 Ctrl Input: %s'%s2CtrlInput
 	
 	print 'UniversalCircuit testing start...'
-	for test in list(product([0,1], repeat=inputLength)):
+	for test in product([0,1], repeat=inputLength):
 		test = list(test)
 		
 		s1Result = simuland1.evaluate(test)
@@ -4,8 +4,16 @@ This module implements a variant of Matrix Branching Programs that is
 close to the ones described by Barrington in [0]. Additionally it 
 implements the transformation of logical circuits consisting solely of
 AND- and NOT-gates to these MBPs using Barrington's Theorem. The resulting
-MBPs make use of numpy arrays as matrices for their speed benefits in
-comparison to Sage matrices.
+MBPs do not store the 5x5 permutation matrices themselves but the
+equivalent permutation vectors p (p[i] = j iff the matrix maps i to j).
+Multiplying two permutation matrices A*B then boils down to the gather
+b[a], which is a lot cheaper than a matrix product. Use perm2matrix to
+obtain the actual matrix of an instruction.
+
+All permutations that occur are even, i.e. elements of the group A_5
+with its 60 elements. Internally each of them is identified by its
+position in precalculatedId2PermList, so that the product of two
+instructions is a single lookup in the 60x60 Cayley table of A_5.
 
 In order to speed up the transformation and to relief memory consumption
 the transformation relies on integer IDs instead of permutations / matrices.
@@ -15,11 +23,9 @@ recognize exactly those languages in NC 1." Proceedings of the eighteenth
 annual ACM symposium on Theory of computing. ACM, 1986.
 """
 
-from numpy import array, where, dot
-from sys import getsizeof
+from numpy import array, arange, argsort, stack, concatenate, asarray, full, zeros, eye, memmap, uint8, intp
 from os import remove
 from itertools import izip
-import cPickle
 import logging
 
 #---------- Branching Programs ------------------
@@ -29,7 +35,10 @@ class BranchingProgram(object):
 	permutation matrices as instructions.
 	
 	indexList contains all values of inp(i)
-	ins0 and ins1 contain all matrices A_i,0 / A_i,1 respectively
+	ins0 and ins1 contain all permutations A_i,0 / A_i,1 respectively as
+	(length, 5) uint8 arrays of permutation vectors. They are computed on
+	access, the program itself only stores the ids of the permutations
+	in one (2, length) array.
 	"""
 	
 	def __init__(self, ins0, ins1, indexList, zeroPerm, onePerm):
@@ -37,34 +46,87 @@ class BranchingProgram(object):
 		assert(not (zeroPerm==onePerm).all())
 		assert(len(indexList) == len(ins0))
 		self.length = len(ins0)
-		self.ins0 = ins0
-		self.ins1 = ins1
+		self._ins = stack((_perms2ids(ins0), _perms2ids(ins1)))
 		self.indexList = indexList
+		self._indices = asarray(indexList, dtype=intp)
 		self.zeroPerm = zeroPerm
 		self.onePerm = onePerm
+		self._zeroId = _perms2ids([zeroPerm])[0]
+		self._oneId = _perms2ids([onePerm])[0]
+	
+	@property
+	def ins0(self): return _ID2PERM[self._ins[0]]
+	
+	@property
+	def ins1(self): return _ID2PERM[self._ins[1]]
+	
+	@property
+	def ids(self):
+		"""Lists of the permutation ids of ins0 and ins1, see composeIds"""
+		return self._ins.tolist()
+	
+	@classmethod
+	def fromIds(cls, ids0, ids1, indexList, zeroPerm, onePerm):
+		"""Create a branching program from lists of permutation ids"""
+		return cls(_ID2PERM[ids0], _ID2PERM[ids1], indexList, zeroPerm, onePerm)
 		
 	def evaluate(self, inputs):
 		"""Evaluate the branching program for list of input values"""
 		
 		logging.info('Evaluating branching program for inputs: %s', str(inputs))
-		assert(len(inputs) >= max(self.indexList))
-		assert(all(bit in (0,1) for bit in inputs))
+		bits = asarray(inputs, dtype=intp)
+		assert(len(bits) >= self._indices.max())
+		assert(((bits == 0) | (bits == 1)).all())
 		
-		matrices = ((in1 if inputs[index] else in0) for in0, in1, index in izip(self.ins0, self.ins1, self.indexList))
-		result = reduce(dot, matrices)
+		#select all instructions at once, then compose neighbouring pairs until only one permutation is left
+		selection = bits[self._indices]
+		ids = self._ins[selection, arange(self.length)]
+		while len(ids) > 1:
+			#pad with the identity (id 0) to get an even number of permutations
+			if len(ids)%2 == 1:
+				ids = concatenate((ids, [0]))
+			ids = _CAYLEY[ids[0::2], ids[1::2]]
+		result = ids[0]
 
 		ret = -1
-		if (result==self.zeroPerm).all(): ret = 0
-		if (result==self.onePerm).all(): ret = 1
+		if result == self._zeroId: ret = 0
+		if result == self._oneId: ret = 1
 		logging.info('MBP evaluation result: %d', ret)
 		assert(ret != -1)
 		return ret
-		
+
+	def evaluateBatch(self, inputMatrix):
+		"""Evaluate the branching program for many inputs at once
+
+		inputMatrix contains one list of input values per row, the
+		results are returned as array in the same order. All rows are
+		reduced together, so each round of composing neighbouring pairs
+		is a single lookup in the Cayley table.
+		"""
+
+		bits = asarray(inputMatrix, dtype=intp)
+		assert(bits.ndim == 2 and bits.shape[1] >= self._indices.max())
+		assert(((bits == 0) | (bits == 1)).all())
+		logging.info('Evaluating branching program for %d inputs', len(bits))
+
+		ids = self._ins[bits[:, self._indices], arange(self.length)]
+		while ids.shape[1] > 1:
+			if ids.shape[1]%2 == 1:
+				ids = concatenate((ids, zeros((len(ids), 1), dtype=ids.dtype)), axis=1)
+			ids = _CAYLEY[ids[:, 0::2], ids[:, 1::2]]
+		result = ids[:, 0]
+
+		ret = full(len(result), -1, dtype=intp)
+		ret[result == self._zeroId] = 0
+		ret[result == self._oneId] = 1
+		assert((ret != -1).all())
+		return ret
+
 	def getInstructionString(self):
 		"""Return a human readable string of the instructions"""
 	
-		strIns0 = map(_matrix2cycle, self.ins0)
-		strIns1 = map(_matrix2cycle, self.ins1)
+		strIns0 = map(_perm2cycle, self.ins0.tolist())
+		strIns1 = map(_perm2cycle, self.ins1.tolist())
 		strList = ["<%d,%s,%s>"%a for a in izip(self.indexList, strIns0, strIns1)]
 		return ''.join(strList)
 	
@@ -74,93 +136,125 @@ class BranchingProgram(object):
 		program as required by the rest of the construction
 		
 		This implementation uses integer IDs instead of permutation 
-		matrices during the generation for performance reasons.
+		matrices during the generation for performance reasons. The IDs
+		are kept in uint8 arrays so that each mapping can be applied to
+		a whole program with a single fancy indexing operation.
+		Instead of pushing every sub program through the mappings once
+		per level of the circuit, the mappings of all enclosing gates are
+		composed into one table that is handed down the recursion.
+		The program of a gate that is used by several other gates is
+		only generated once and kept until its last use.
 		For a breakdown of how this mappings were created refer to
 		the module generate_bp_mappings
 		"""
 		
-		mappings = precalculatedMappings()
-		id2perms = precalculatedId2PermList()
+		mappings = _MAPPINGS
+		id2perms = _ID2PERM
 		class saveCtr: x=1
+		
+		#remaining number of uses for each gate, only shared gates are cached
+		uses = {}
+		for gate in circuit.getDict().values():
+			for input in ([gate.input1] if gate.getType() == 0 else [gate.input1, gate.input2]):
+				if input.getType() != -1: uses[input.id] = uses.get(input.id, 0) + 1
+		#unmapped programs (identity table) of shared gates
+		cache = {}
 
-		def fastGetIns(gate):
+		#all mappings are bijections on the ids, so a sub program mapped by
+		#one table can be remapped by another one via the inverse (argsort)
+		def fastGetIns(gate, table):
+			"""Return the ids of the program for gate, already mapped by table"""
+			
+			if gate.id in cache:
+				id0List, id1List, indexList = cache[gate.id]
+				uses[gate.id] -= 1
+				if uses[gate.id] == 0: del cache[gate.id]
+				return (table[id0List], table[id1List], indexList)
+			
+			ret = getIns(gate, table)
+			
+			if uses.get(gate.id, 0) > 1:
+				inverse = argsort(table)
+				cache[gate.id] = (inverse[ret[0]], inverse[ret[1]], ret[2])
+				uses[gate.id] -= 1
+			return ret
+		
+		def getIns(gate, table):
 			#Input
 			if gate.getType() == -1:
-				return ([0], [1], [gate.pos])
+				return (table[[0]], table[[1]], array([gate.pos], dtype=intp))
 			
 			#NotGate
 			elif gate.getType() == 0:
-				id0List, id1List, indexList = fastGetIns(gate.input1)
-				id0List[-1] = mappings[0][id0List[-1]]
-				id1List[-1] = mappings[0][id1List[-1]]
-				id0List[:-1] = [mappings[1][id] for id in id0List[:-1]]
-				id1List[:-1] = [mappings[1][id] for id in id1List[:-1]]
+				notAll = table[mappings[1]]
+				id0List, id1List, indexList = fastGetIns(gate.input1, notAll)
+				#only the last instruction is mapped with mappings[0] instead
+				notLast = table[mappings[0]][argsort(notAll)]
+				id0List[-1] = notLast[id0List[-1]]
+				id1List[-1] = notLast[id1List[-1]]
 				
 				return (id0List, id1List, indexList)
 				
 			elif gate.getType() == 1:
-				id0List1, id1List1, indexList1 = fastGetIns(gate.input1)
-				a01 = [mappings[2][id] for id in id0List1]
-				a11 = [mappings[2][id] for id in id1List1]
-				a03 = [mappings[3][id] for id in id0List1]
-				a13 = [mappings[3][id] for id in id1List1]
-				#'garbage collection'
-				id0List1 = None
-				id1List1 = None
+				and1 = table[mappings[2]]
+				a01, a11, indexList1 = fastGetIns(gate.input1, and1)
+				and3 = table[mappings[3]][argsort(and1)]
+				a03 = and3[a01]
+				a13 = and3[a11]
 				
-				#write to disk
-				if caching==True and getsizeof(a01) > 1000000: #1 mb
-					logging.info('caching with size %d...'%getsizeof(a01))
-					with open('%d.tmp'%saveCtr.x, 'wb') as output:
-						cPickle.dump(a01, output, -1)
-						cPickle.dump(a11, output, -1)
-						cPickle.dump(a03, output, -1)
-						cPickle.dump(a13, output, -1)
+				#write to disk, only necessary for huge programs since the ids use one byte each
+				cacheFile = None
+				if caching==True and a01.nbytes > 100000000: #100 mb
+					logging.info('caching with size %d...'%a01.nbytes)
+					cacheFile = '%d.tmp'%saveCtr.x
+					spill = memmap(cacheFile, dtype=uint8, mode='w+', shape=(4, len(a01)))
+					spill[:] = (a01, a11, a03, a13)
+					spill.flush()
+					spill = None
 					a01 = None
 					a11 = None
 					a03 = None
 					a13 = None
 					saveCtr.x += 1
 				
-				id0List2, id1List2, indexList2 = fastGetIns(gate.input2)
-				a02 = [mappings[4][id] for id in id0List2]
-				a12 = [mappings[4][id] for id in id1List2]
-				a04 = [mappings[5][id] for id in id0List2]
-				a14 = [mappings[5][id] for id in id1List2]
-				#'garbage collection'
-				id0List2 = None
-				id1List2 = None
+				and2 = table[mappings[4]]
+				a02, a12, indexList2 = fastGetIns(gate.input2, and2)
+				and4 = table[mappings[5]][argsort(and2)]
+				a04 = and4[a02]
+				a14 = and4[a12]
 				
 				#load from disk
-				if a01 is None:
+				if cacheFile is not None:
 					logging.info('loading...')
 					saveCtr.x -= 1
-					with open('%d.tmp'%saveCtr.x, 'rb') as input:
-						a01 = cPickle.load(input)
-						a11 = cPickle.load(input)
-						a03 = cPickle.load(input)
-						a13 = cPickle.load(input)
-					remove('%d.tmp'%saveCtr.x)
+					a01, a11, a03, a13 = memmap(cacheFile, dtype=uint8, mode='r', shape=(4, len(indexList1)))
 				
-				return (a01+a02+a03+a04, a11+a12+a13+a14, indexList1+indexList2+indexList1+indexList2)
+				ret = (concatenate((a01, a02, a03, a04)), concatenate((a11, a12, a13, a14)), 
+					concatenate((indexList1, indexList2, indexList1, indexList2)))
+				
+				if cacheFile is not None:
+					a01 = None
+					a11 = None
+					a03 = None
+					a13 = None
+					remove(cacheFile)
+				
+				return ret
 			
 			raise AttributeError
 		
 		logging.info('Calculating permutation idList')
-		id0List, id1List, indexList = fastGetIns(circuit.outputGate)
+		id0List, id1List, indexList = fastGetIns(circuit.outputGate, arange(len(id2perms), dtype=uint8))
 		
-		logging.info('Mapping ids to permutation matrices')
-		#instructions = [tuple(id2perms[id] for id in t) for t in idList]
-		ins0 = [id2perms[id] for id in id0List]
-		ins1 = [id2perms[id] for id in id1List]
-		ins0.append(_normalInv())
-		ins1.append(_normalInv())
-		indexList.append(0)
+		logging.info('Mapping ids to permutation vectors')
+		ins0 = concatenate((id2perms[id0List], [_normalInv()]))
+		ins1 = concatenate((id2perms[id1List], [_normalInv()]))
+		indexList = indexList.tolist()+[0]
 		return BranchingProgram(ins0, ins1, indexList, _normalInv(), _identity())
 		
 	@classmethod
 	def estimateBPSize(cls, circuit):
-		"""Recursively calculates the expected size of the BP belonging to circuit.
+		"""Calculates the expected size of the BP belonging to circuit.
 		
 		Uses the formula
 		len_BP(gate) = 	| 1 										if type(gate) = Input
@@ -168,37 +262,65 @@ class BranchingProgram(object):
 						| 2*len(gate.input1) + 2*len(gate.input2)	if type(gate) = AND
 						
 		Note that this 'estimation' should indeed be exact.
+		The gates are visited in post-order with an explicit stack, so
+		deep circuits do not hit the recursion limit. Sizes are kept as
+		Python integers since they easily exceed 64 bits.
 		"""
-		cache = {}
+		sizes = {}
+		stack = [circuit.outputGate]
 		
-		def _estimateBPSize(gate):
-			if gate.getType() == -1:
-					return 1
-			if gate.id in cache:
-				ret = cache[gate.id]
+		while stack:
+			gate = stack[-1]
+			if gate.id in sizes:
+				stack.pop()
+			elif gate.getType() == -1:
+				sizes[gate.id] = 1
+				stack.pop()
 			else:
-				if gate.getType() == 0:
-					ret = _estimateBPSize(gate.input1)
-				elif gate.getType() == 1:
-					ret = 2*_estimateBPSize(gate.input1)+2*_estimateBPSize(gate.input2)
-				cache[gate.id] = ret
-			return ret
+				inputs = [gate.input1] if gate.getType() == 0 else [gate.input1, gate.input2]
+				missing = [inp for inp in inputs if inp.id not in sizes]
+				if missing:
+					stack.extend(missing)
+				else:
+					stack.pop()
+					if gate.getType() == 0:
+						sizes[gate.id] = sizes[gate.input1.id]
+					else:
+						sizes[gate.id] = 2*sizes[gate.input1.id]+2*sizes[gate.input2.id]
 	
-		return _estimateBPSize(circuit.outputGate)+1
+		return sizes[circuit.outputGate.id]+1
 	
 	def __str__(self):
 		return 'Branching Program of length %d, Zero Perm: %s, One Perm: %s' % \
-			(self.length, _matrix2cycle(self.zeroPerm), _matrix2cycle(self.onePerm))
+			(self.length, _perm2cycle(self.zeroPerm), _perm2cycle(self.onePerm))
 			
-def _matrix2cycle(permMatrix):
-	"""Helper function to get cycle notation of permutation matrix"""
+def composePerms(first, second):
+	"""Return the permutation vector of the matrix product first*second"""
+	
+	return second[first]
+
+def composeIds(first, second):
+	"""Return the id of the product of the permutations with ids first and second"""
 	
-	lookedAt = [0]*permMatrix.shape[0]
+	return _CAYLEY_LIST[first][second]
+
+def perm2matrix(perm):
+	"""Return the permutation matrix belonging to a permutation vector"""
+	
+	return eye(5, dtype=int)[perm]
+
+def _perm2cycle(perm):
+	"""Helper function to get cycle notation of permutation vector"""
+	
+	indices = tuple(perm)
+	#bit i of lookedAt is set once position i has been visited
+	lookedAt = 0
+	allLookedAt = (1 << len(indices)) - 1
 	ret = ''
-	indices = list(where(permMatrix==1)[1])
+	start = 0
 	
-	while not all(lookedAt):
-		start = lookedAt.index(0)
+	while lookedAt != allLookedAt:
+		while lookedAt >> start & 1: start += 1
 		
 		if indices[start] != start:		#doesn't point to itself
 			ret += '('+str(start)
@@ -206,17 +328,23 @@ def _matrix2cycle(permMatrix):
 			curr = indices[start]
 			while start!=curr:
 				ret += str(curr)
-				lookedAt[curr] = 1
+				lookedAt |= 1 << curr
 				curr = indices[curr]
 			ret += ')'
 			
-		lookedAt[start] = 1
+		lookedAt |= 1 << start
 	
 	if ret=='': ret='e'
 	return ret
 
-def _identity(): return array([[1,0,0,0,0],[0,1,0,0,0],[0,0,1,0,0],[0,0,0,1,0],[0,0,0,0,1]])	#e
-def _normalInv(): return array([[0,0,0,0,1],[1,0,0,0,0],[0,1,0,0,0],[0,0,1,0,0],[0,0,0,1,0]])	#(04321)
+#shared read-only constants, copy before modifying
+_IDENTITY = array([0,1,2,3,4], dtype=uint8)	#e
+_IDENTITY.flags.writeable = False
+_NORMAL_INV = array([4,0,1,2,3], dtype=uint8)	#(04321)
+_NORMAL_INV.flags.writeable = False
+
+def _identity(): return _IDENTITY
+def _normalInv(): return _NORMAL_INV
 
 def precalculatedMappings():
 	"""Generated using calculateMappings() from generate_bp_mappings.py"""
@@ -226,7 +354,34 @@ def precalculatedMappings():
 def precalculatedId2PermList():
 	"""Generated in generate_bp_mappings.py"""
 	
-	return [array([[1,0,0,0,0],[0,1,0,0,0],[0,0,1,0,0],[0,0,0,1,0],[0,0,0,0,1]]),array([[0,1,0,0,0],[0,0,1,0,0],[0,0,0,1,0],[0,0,0,0,1],[1,0,0,0,0]]),array([[0,0,0,0,1],[1,0,0,0,0],[0,1,0,0,0],[0,0,1,0,0],[0,0,0,1,0]]),array([[0,0,1,0,0],[0,0,0,0,1],[0,1,0,0,0],[1,0,0,0,0],[0,0,0,1,0]]),array([[0,0,0,1,0],[0,0,1,0,0],[1,0,0,0,0],[0,0,0,0,1],[0,1,0,0,0]]),array([[0,1,0,0,0],[0,0,0,1,0],[1,0,0,0,0],[0,0,0,0,1],[0,0,1,0,0]]),array([[0,0,1,0,0],[1,0,0,0,0],[0,0,0,0,1],[0,1,0,0,0],[0,0,0,1,0]]),array([[0,0,1,0,0],[0,0,0,1,0],[0,0,0,0,1],[1,0,0,0,0],[0,1,0,0,0]]),array([[0,0,0,0,1],[0,0,0,1,0],[0,1,0,0,0],[1,0,0,0,0],[0,0,1,0,0]]),array([[0,0,0,1,0],[0,0,1,0,0],[0,0,0,0,1],[0,1,0,0,0],[1,0,0,0,0]]),array([[0,0,0,1,0],[1,0,0,0,0],[0,0,1,0,0],[0,1,0,0,0],[0,0,0,0,1]]),array([[1,0,0,0,0],[0,0,0,0,1],[0,0,1,0,0],[0,1,0,0,0],[0,0,0,1,0]]),array([[0,1,0,0,0],[0,0,0,0,1],[0,0,0,1,0],[1,0,0,0,0],[0,0,1,0,0]]),array([[0,0,1,0,0],[0,0,0,0,1],[0,0,0,1,0],[0,1,0,0,0],[1,0,0,0,0]]),array([[0,0,0,0,1],[0,0,0,1,0],[1,0,0,0,0],[0,0,1,0,0],[0,1,0,0,0]]),array([[0,0,0,1,0],[1,0,0,0,0],[0,0,0,0,1],[0,0,1,0,0],[0,1,0,0,0]]),array([[0,0,0,1,0],[0,0,0,0,1],[1,0,0,0,0],[0,1,0,0,0],[0,0,1,0,0]]),array([[0,1,0,0,0],[0,0,0,1,0],[0,0,0,0,1],[0,0,1,0,0],[1,0,0,0,0]]),array([[0,0,0,0,1],[1,0,0,0,0],[0,0,0,1,0],[0,1,0,0,0],[0,0,1,0,0]]),array([[0,0,0,1,0],[0,0,0,0,1],[0,1,0,0,0],[0,0,1,0,0],[1,0,0,0,0]]),array([[0,0,0,0,1],[0,0,1,0,0],[0,0,0,1,0],[1,0,0,0,0],[0,1,0,0,0]]),array([[0,0,0,1,0],[0,1,0,0,0],[1,0,0,0,0],[0,0,1,0,0],[0,0,0,0,1]]),array([[0,0,1,0,0],[0,1,0,0,0],[0,0,0,0,1],[0,0,0,1,0],[1,0,0,0,0]]),array([[0,0,0,0,1],[0,1,0,0,0],[1,0,0,0,0],[0,0,0,1,0],[0,0,1,0,0]]),array([[0,1,0,0,0],[0,0,0,1,0],[0,0,1,0,0],[1,0,0,0,0],[0,0,0,0,1]]),array([[0,0,0,0,1],[1,0,0,0,0],[0,0,1,0,0],[0,0,0,1,0],[0,1,0,0,0]]),array([[1,0,0,0,0],[0,0,1,0,0],[0,0,0,0,1],[0,0,0,1,0],[0,1,0,0,0]]),array([[1,0,0,0,0],[0,1,0,0,0],[0,0,0,1,0],[0,0,0,0,1],[0,0,1,0,0]]),array([[1,0,0,0,0],[0,0,0,1,0],[0,1,0,0,0],[0,0,1,0,0],[0,0,0,0,1]]),array([[1,0,0,0,0],[0,0,0,0,1],[0,1,0,0,0],[0,0,0,1,0],[0,0,1,0,0]]),array([[1,0,0,0,0],[0,1,0,0,0],[0,0,0,0,1],[0,0,1,0,0],[0,0,0,1,0]]),array([[0,1,0,0,0],[0,0,0,0,1],[1,0,0,0,0],[0,0,1,0,0],[0,0,0,1,0]]),array([[0,0,1,0,0],[1,0,0,0,0],[0,0,0,1,0],[0,0,0,0,1],[0,1,0,0,0]]),array([[0,0,1,0,0],[0,0,0,0,1],[1,0,0,0,0],[0,0,0,1,0],[0,1,0,0,0]]),array([[0,0,0,1,0],[0,1,0,0,0],[0,0,0,0,1],[1,0,0,0,0],[0,0,1,0,0]]),array([[0,0,0,0,1],[0,0,1,0,0],[1,0,0,0,0],[0,1,0,0,0],[0,0,0,1,0]]),array([[0,0,0,1,0],[1,0,0,0,0],[0,1,0,0,0],[0,0,0,0,1],[0,0,1,0,0]]),array([[0,0,1,0,0],[1,0,0,0,0],[0,1,0,0,0],[0,0,0,1,0],[0,0,0,0,1]]),array([[0,0,1,0,0],[0,0,0,1,0],[0,1,0,0,0],[0,0,0,0,1],[1,0,0,0,0]]),array([[0,1,0,0,0],[0,0,1,0,0],[0,0,0,0,1],[1,0,0,0,0],[0,0,0,1,0]]),array([[0,0,1,0,0],[0,1,0,0,0],[0,0,0,1,0],[1,0,0,0,0],[0,0,0,0,1]]),array([[0,1,0,0,0],[0,0,0,0,1],[0,0,1,0,0],[0,0,0,1,0],[1,0,0,0,0]]),array([[0,0,0,0,1],[0,1,0,0,0],[0,0,1,0,0],[1,0,0,0,0],[0,0,0,1,0]]),array([[0,0,0,1,0],[0,1,0,0,0],[0,0,1,0,0],[0,0,0,0,1],[1,0,0,0,0]]),array([[0,0,0,0,1],[0,1,0,0,0],[0,0,0,1,0],[0,0,1,0,0],[1,0,0,0,0]]),array([[1,0,0,0,0],[0,0,1,0,0],[0,1,0,0,0],[0,0,0,0,1],[0,0,0,1,0]]),array([[0,1,0,0,0],[0,0,1,0,0],[1,0,0,0,0],[0,0,0,1,0],[0,0,0,0,1]]),array([[0,1,0,0,0],[1,0,0,0,0],[0,0,0,1,0],[0,0,1,0,0],[0,0,0,0,1]]),array([[1,0,0,0,0],[0,0,0,1,0],[0,0,1,0,0],[0,0,0,0,1],[0,1,0,0,0]]),array([[1,0,0,0,0],[0,0,1,0,0],[0,0,0,1,0],[0,1,0,0,0],[0,0,0,0,1]]),array([[1,0,0,0,0],[0,0,0,1,0],[0,0,0,0,1],[0,1,0,0,0],[0,0,1,0,0]]),array([[0,0,0,1,0],[0,0,0,0,1],[0,0,1,0,0],[1,0,0,0,0],[0,1,0,0,0]]),array([[0,0,0,1,0],[0,0,1,0,0],[0,1,0,0,0],[1,0,0,0,0],[0,0,0,0,1]]),array([[0,0,0,0,1],[0,0,1,0,0],[0,1,0,0,0],[0,0,0,1,0],[1,0,0,0,0]]),array([[0,0,1,0,0],[0,0,0,1,0],[1,0,0,0,0],[0,1,0,0,0],[0,0,0,0,1]]),array([[0,0,0,0,1],[0,0,0,1,0],[0,0,1,0,0],[0,1,0,0,0],[1,0,0,0,0]]),array([[0,1,0,0,0],[1,0,0,0,0],[0,0,0,0,1],[0,0,0,1,0],[0,0,1,0,0]]),array([[0,0,1,0,0],[0,1,0,0,0],[1,0,0,0,0],[0,0,0,0,1],[0,0,0,1,0]]),array([[0,1,0,0,0],[1,0,0,0,0],[0,0,1,0,0],[0,0,0,0,1],[0,0,0,1,0]]),array([[1,0,0,0,0],[0,0,0,0,1],[0,0,0,1,0],[0,0,1,0,0],[0,1,0,0,0]])]
+	return [array([0,1,2,3,4], dtype=uint8),array([1,2,3,4,0], dtype=uint8),array([4,0,1,2,3], dtype=uint8),array([2,4,1,0,3], dtype=uint8),array([3,2,0,4,1], dtype=uint8),array([1,3,0,4,2], dtype=uint8),array([2,0,4,1,3], dtype=uint8),array([2,3,4,0,1], dtype=uint8),array([4,3,1,0,2], dtype=uint8),array([3,2,4,1,0], dtype=uint8),array([3,0,2,1,4], dtype=uint8),array([0,4,2,1,3], dtype=uint8),array([1,4,3,0,2], dtype=uint8),array([2,4,3,1,0], dtype=uint8),array([4,3,0,2,1], dtype=uint8),array([3,0,4,2,1], dtype=uint8),array([3,4,0,1,2], dtype=uint8),array([1,3,4,2,0], dtype=uint8),array([4,0,3,1,2], dtype=uint8),array([3,4,1,2,0], dtype=uint8),array([4,2,3,0,1], dtype=uint8),array([3,1,0,2,4], dtype=uint8),array([2,1,4,3,0], dtype=uint8),array([4,1,0,3,2], dtype=uint8),array([1,3,2,0,4], dtype=uint8),array([4,0,2,3,1], dtype=uint8),array([0,2,4,3,1], dtype=uint8),array([0,1,3,4,2], dtype=uint8),array([0,3,1,2,4], dtype=uint8),array([0,4,1,3,2], dtype=uint8),array([0,1,4,2,3], dtype=uint8),array([1,4,0,2,3], dtype=uint8),array([2,0,3,4,1], dtype=uint8),array([2,4,0,3,1], dtype=uint8),array([3,1,4,0,2], dtype=uint8),array([4,2,0,1,3], dtype=uint8),array([3,0,1,4,2], dtype=uint8),array([2,0,1,3,4], dtype=uint8),array([2,3,1,4,0], dtype=uint8),array([1,2,4,0,3], dtype=uint8),array([2,1,3,0,4], dtype=uint8),array([1,4,2,3,0], dtype=uint8),array([4,1,2,0,3], dtype=uint8),array([3,1,2,4,0], dtype=uint8),array([4,1,3,2,0], dtype=uint8),array([0,2,1,4,3], dtype=uint8),array([1,2,0,3,4], dtype=uint8),array([1,0,3,2,4], dtype=uint8),array([0,3,2,4,1], dtype=uint8),array([0,2,3,1,4], dtype=uint8),array([0,3,4,1,2], dtype=uint8),array([3,4,2,0,1], dtype=uint8),array([3,2,1,0,4], dtype=uint8),array([4,2,1,3,0], dtype=uint8),array([2,3,0,1,4], dtype=uint8),array([4,3,2,1,0], dtype=uint8),array([1,0,4,3,2], dtype=uint8),array([2,1,0,4,3], dtype=uint8),array([1,0,2,4,3], dtype=uint8),array([0,4,3,2,1], dtype=uint8)]
+	
+#mappings as one contiguous (6, 60) table for vectorized lookups
+_MAPPINGS = array(precalculatedMappings(), dtype=uint8)
+_MAPPINGS.flags.writeable = False
+
+#permutation vector of each id
+_ID2PERM = stack(precalculatedId2PermList())
+_ID2PERM.flags.writeable = False
+
+#a permutation vector packs into 15 bits (3 bits per entry), _PACKED2ID maps those to the id
+_PACKING_SHIFTS = array([0, 3, 6, 9, 12])
+_PACKED2ID = full(1 << 15, 255, dtype=uint8)
+_PACKED2ID[(_ID2PERM.astype(intp) << _PACKING_SHIFTS).sum(axis=1)] = arange(len(_ID2PERM))
+_PACKED2ID.flags.writeable = False
+
+def _perms2ids(perms):
+	"""Return the ids of a sequence of permutation vectors in one uint8 array"""
+	
+	ids = _PACKED2ID[(asarray(perms, dtype=intp) << _PACKING_SHIFTS).sum(axis=1)]
+	assert((ids != 255).all())
+	return ids
+
+#Cayley table of A_5: _CAYLEY[a, b] is the id of composePerms(perm of a, perm of b)
+_CAYLEY = _perms2ids(_ID2PERM[arange(len(_ID2PERM))[None,:,None], _ID2PERM[:,None,:]].reshape(-1, 5)).reshape(len(_ID2PERM), len(_ID2PERM))
+_CAYLEY.flags.writeable = False
+#nested lists are faster than numpy indexing for single lookups
+_CAYLEY_LIST = _CAYLEY.tolist()
 	
 if __name__ == '__main__':
 	
@@ -247,7 +402,7 @@ if __name__ == '__main__':
 	print bp.getInstructionString()
 	
 	print('BranchinProgram testing start...')
-	for test in list(product([0,1], repeat=inputLength)):
+	for test in product([0,1], repeat=inputLength):
 		test = list(test)
 		circuitResult = crc.evaluate(test)
 		bpResult = bp.evaluate(test)
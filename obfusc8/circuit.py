@@ -10,6 +10,7 @@ each class provides a variety of functionalities.
 
 import logging
 from itertools import count
+from numpy import array, arange, bincount, empty, packbits, unpackbits, concatenate, zeros, invert, bitwise_and, intp, uint8, uint64
 
 #------------ Circuit --------------------------
 
@@ -31,31 +32,62 @@ class Circuit(object):
 		
 		#contains [#NotGates, #AndGates, #NotGates (reuse allowed), #AndGates (reuse allowed)]
 		self.numGates = [None, None, None, None]
+		#results of _walk, _tape, getDict and _compile, computed on first use
+		self._walkResult = None
+		self._dict = None
+		self._tapeResult = None
+		self._compiled = None
 		
 		#if no inputs were supplied, find them by depth first search
 		if inputs==[]:
-			seen = set()
-			seen_add = seen.add
-			#make found inputs unique
-			self.inputs = [ x for x in self.outputGate.getInputs() if not (x in seen or seen_add(x))]
+			_, leaves = self._walk()
+			self.inputs = [x for leaf in leaves for x in leaf.getInputs()]
 		
-		#calculate the controls positions
-		[ctrl.setPos(pos) for ctrl, pos in zip(self.controls, range(len(self.controls)))]
-		[inp.setPos(pos) for inp, pos in zip(self.inputs, range(len(self.controls), len(self.controls)+len(self.inputs)))]
+		#calculate the positions, controls come first
+		for pos, leaf in enumerate(self.controls+self.inputs):
+			leaf.setPos(pos)
 	
 	def evaluate(self, inputValues):
 		"""Evaluate the circuit for list of input values"""
 		
-		logging.info('Evaluating circuit with inputs: %s', str(inputValues))
-		assert(len(self.controls+self.inputs) == len(inputValues))
+		#formatting is left to logging, so it only happens if INFO is enabled
+		logging.info('Evaluating circuit with inputs: %s', inputValues)
+		assert(len(self.controls)+len(self.inputs) == len(inputValues))
 		assert(all(bit in (0,1) for bit in inputValues))
 		
-		map(Input.set, self.controls+self.inputs, inputValues)
-		ret = self.outputGate.evaluate()
+		#the compiled circuit reads the values directly, the inputs are not set
+		ret = self._compile()(inputValues)
 		
 		logging.info('Circuit evaluation result: %d', ret)
 		return ret
 	
+	def evaluateTruthTable(self):
+		"""Evaluate the circuit for all possible input values at once
+		
+		Returns an array with the 0/1 results in the order of
+		itertools.product([0,1], repeat=n) over the controls and inputs.
+		The values of all assignments are packed bitwise into uint64 words,
+		so each gate is evaluated by a single numpy operation on its row
+		of a preallocated value table.
+		"""
+		
+		logging.info('Evaluating truth table of circuit')
+		n = len(self.controls)+len(self.inputs)
+		assignments = arange(2**n)
+		op, a, b = self._tape()
+		
+		values = empty((len(op), -(-2**n//64)), dtype=uint64)
+		for k, (type, x, y) in enumerate(zip(op.tolist(), a.tolist(), b.tolist())):
+			if type == -1:
+				#the first input is the most significant bit of the assignment
+				values[k] = _packBits((assignments >> (n-1-x)) & 1)
+			elif type == 0:
+				invert(values[x], out=values[k])
+			else:
+				bitwise_and(values[x], values[y], out=values[k])
+		
+		return unpackbits(values[-1].view(uint8))[:2**n]
+	
 	def countGates(self, type=None, reuseAllowed=True):
 		"""Recursively count number of gates in the circuit
 		
@@ -65,20 +97,26 @@ class Circuit(object):
 		if type is None:
 			ret = self.countGates(0)+self.countGates(1)
 		else:
-			#calculate if necessary
-			if self.numGates[2*reuseAllowed+type] is None:
-				if reuseAllowed:
-					allGateTypes = [gate.getType() for gate in self.getDict().values()]
-					self.numGates[2+type] = allGateTypes.count(type)
-				else:
-					self.numGates[type] = self.outputGate.countGates(type)	
+			#calculate all counts at once if necessary
+			if self.numGates[0] is None:
+				order, _ = self._walk()
+				op = self._tape()[0]
+				self.numGates[:2] = _countGates(order, self.outputGate)
+				self.numGates[2:] = bincount(op[op >= 0], minlength=2).tolist()
 			ret = self.numGates[2*reuseAllowed+type]
 		return ret
 	
 	def getDepth(self):
 		"""Calculate the depth (= longest path from input to output) of the circuit"""
-	
-		return self.outputGate.getDepth()
+		
+		op, a, b = self._tape()
+		depths = [0]*len(op)
+		for k, (type, x, y) in enumerate(zip(op.tolist(), a.tolist(), b.tolist())):
+			if type == 0:
+				depths[k] = 1+depths[x]
+			elif type == 1:
+				depths[k] = 1+max(depths[x], depths[y])
+		return depths[-1]
 	
 	def getDependency(self):
 		"""Generate dictionary with gate dependencies
@@ -86,25 +124,248 @@ class Circuit(object):
 		Gate A depends on another gate B iff A uses the value of B as input.
 		"""
 		
-		return dict(self.outputGate.getDependency())
+		order, _ = self._walk()
+		return dict((gate.id, set(x.id for x in _directInputs(gate) if x.getType() != -1)) for gate in order)
 		
 	def getDict(self):
-		"""Return dictionary for quick gate access, keys are the gateIDs"""
+		"""Return dictionary for quick gate access, keys are the gateIDs
+		
+		The dictionary is cached and shared between calls, do not modify it.
+		"""
 		
-		return dict(self.outputGate.getDict())
+		if self._dict is None:
+			order, _ = self._walk()
+			self._dict = dict((gate.id, gate) for gate in order)
+		return self._dict
+	
+	def mergeDuplicates(self):
+		"""Merge structurally identical gates of the circuit
+		
+		Two NotGates with the same input or two AndGates with the same
+		(unordered) inputs are replaced by one of them. The gates are
+		rewired in place, so other circuits sharing these gates change
+		as well. Returns the number of removed gates.
+		"""
+		
+		order, _ = self._walk()
+		canonical = {}
+		replacement = {}
+		for gate in order:
+			#inputs are visited first, so they are already canonical
+			gate.input1 = replacement.get(gate.input1.id, gate.input1)
+			if gate.getType() == 0:
+				key = (0, gate.input1.id)
+			else:
+				gate.input2 = replacement.get(gate.input2.id, gate.input2)
+				key = (1, min(gate.input1.id, gate.input2.id), max(gate.input1.id, gate.input2.id))
+			if key in canonical:
+				replacement[gate.id] = canonical[key]
+			else:
+				canonical[key] = gate
+		self.outputGate = replacement.get(self.outputGate.id, self.outputGate)
+		
+		#structure changed, forget everything derived from it
+		self.numGates = [None, None, None, None]
+		self._walkResult = None
+		self._dict = None
+		self._tapeResult = None
+		self._compiled = None
+		
+		logging.info('Merged %d duplicate gates', len(replacement))
+		return len(replacement)
+	
+	def _walk(self):
+		"""Iterative depth first search through the circuit
+		
+		Returns all gates in post-order (each gate after its inputs) and
+		all inputs and controls in the order of their first appearance.
+		Shared gates are only visited once. The result is cached, since
+		the structure of a circuit does not change after creation.
+		"""
+		
+		if self._walkResult is None:
+			self._walkResult = _walkGates(self.outputGate)
+		return self._walkResult
+	
+	def _tape(self):
+		"""Linearize the circuit into the three arrays op, a and b
+		
+		Row k describes one input or gate: op[k] is its type (see getType),
+		a[k] and b[k] are the rows of its inputs. For inputs a[k] holds
+		the position instead. Inputs come first, the output is the last row.
+		"""
+		
+		if self._tapeResult is None:
+			order, leaves = self._walk()
+			rows = dict((x.id, k) for k, x in enumerate(leaves+order))
+			slots = self._slots()
+			op = [-1]*len(leaves) + [gate.getType() for gate in order]
+			a = [slots[leaf.id] for leaf in leaves] + [rows[gate.input1.id] for gate in order]
+			b = [0]*len(leaves) + [rows[gate.input2.id] if gate.getType() == 1 else 0 for gate in order]
+			self._tapeResult = tuple(array(x, dtype=intp) for x in (op, a, b))
+		return self._tapeResult
+	
+	def _slots(self):
+		"""Return the position of each control and input of this circuit
+		
+		The dict maps the ids to the index in the list of input values.
+		Input.pos can not be used for this after creation, since it is
+		overwritten by every other circuit that shares the inputs.
+		"""
+		
+		return dict((leaf.id, k) for k, leaf in enumerate(self.controls+self.inputs))
+	
+	def _compile(self):
+		"""Compile the circuit into a straight-line python function
+		
+		The function takes the list of control and input values and
+		computes every gate exactly once, in topological order.
+		"""
+		
+		if self._compiled is None:
+			order, leaves = self._walk()
+			slots = self._slots()
+			lines = ['def _evaluate(v):']
+			lines.extend('\tt%d = v[%d]'%(leaf.id, slots[leaf.id]) for leaf in leaves)
+			for gate in order:
+				if gate.getType() == 0:
+					lines.append('\tt%d = t%d ^ 1'%(gate.id, gate.input1.id))
+				else:
+					lines.append('\tt%d = t%d & t%d'%(gate.id, gate.input1.id, gate.input2.id))
+			lines.append('\treturn t%d'%self.outputGate.id)
+			namespace = {}
+			exec compile('\n'.join(lines), '<circuit>', 'exec') in namespace
+			self._compiled = namespace['_evaluate']
+		return self._compiled
+	
+	def __getstate__(self):
+		#the compiled function can not be pickled, it is rebuilt on demand
+		state = self.__dict__.copy()
+		state['_compiled'] = None
+		return state
 	
 	def __str__(self):
 		return str(self.outputGate)
 		
+def _packBits(bits):
+	"""Pack array of 0/1 values into uint64 words (padded with zeros)"""
+	
+	packed = packbits(bits.astype(uint8))
+	return concatenate((packed, zeros(-len(packed)%8, dtype=uint8))).view(uint64)
+
+def _walkGates(outputGate):
+	"""Iterative depth first search starting at outputGate
+	
+	Returns all gates in post-order and all inputs in the order
+	of their first appearance, see Circuit._walk
+	"""
+	
+	order = []
+	leaves = []
+	seen = set()
+	#(gate, True) marks a gate whose inputs have already been pushed
+	stack = [(outputGate, False)]
+	while stack:
+		gate, expanded = stack.pop()
+		if expanded:
+			order.append(gate)
+		elif gate.id not in seen:
+			seen.add(gate.id)
+			if gate.getType() == -1:
+				leaves.append(gate)
+			else:
+				stack.append((gate, True))
+				#reversed so that input1 is visited first
+				stack.extend((x, False) for x in reversed(_directInputs(gate)))
+	return order, leaves
+
+def _countGates(order, outputGate):
+	"""Return [#NotGates, #AndGates] of the circuit below outputGate
+	
+	order has to be the post-order of the circuit. Every use of a gate is
+	counted separately. Python ints are used since the counts grow
+	exponentially with the depth.
+	"""
+	
+	counts = {}
+	for gate in order:
+		count = [0, 0]
+		count[gate.getType()] = 1
+		for x in _directInputs(gate):
+			if x.id in counts:
+				count[0] += counts[x.id][0]
+				count[1] += counts[x.id][1]
+		counts[gate.id] = count
+	return counts.get(outputGate.id, [0, 0])
+
+def _directInputs(gate):
+	"""Return the gates and inputs that are wired directly into gate"""
+	
+	if gate.getType() == 0: return (gate.input1,)
+	if gate.getType() == 1: return (gate.input1, gate.input2)
+	return ()
+		
 class Gate(object):
 	"""Super class for all gates, should never be instantiated"""
 
+	#no per instance dict, circuits can consist of millions of gates
+	__slots__ = ('id',)
+	
 	newid = count().next
 	
 	def __init__(self):
 		#generate unique ID for each gate
 		self.id = Gate.newid()
-		self.numGates = [None, None]
+	
+	def evaluate(self):
+		"""Evaluate the gate for the values currently set at the inputs
+		
+		Every gate below this one is evaluated once, in post-order.
+		"""
+		
+		order, leaves = _walkGates(self)
+		values = dict((leaf.id, leaf.value) for leaf in leaves)
+		for gate in order:
+			if gate.getType() == 0:
+				values[gate.id] = values[gate.input1.id] ^ 1
+			else:
+				values[gate.id] = values[gate.input1.id] & values[gate.input2.id]
+		return values[self.id]
+	
+	def countGates(self, type):
+		"""Count gates of type (0: NotGate, 1: AndGate) up to this gate, every use counted separately"""
+		
+		order, _ = _walkGates(self)
+		return _countGates(order, self)[type]
+	
+	def getDepth(self):
+		"""Calculate the length of the longest path from an input to this gate"""
+		
+		order, _ = _walkGates(self)
+		depths = {}
+		for gate in order:
+			depths[gate.id] = 1+max(depths.get(x.id, 0) for x in _directInputs(gate))
+		return depths[self.id]
+	
+	def getInputs(self, ctrl=False):
+		"""Return the inputs (or controls) this gate depends on
+		
+		Each input appears once, in the order of its first appearance.
+		"""
+		
+		ret = []
+		seen = set()
+		stack = [self]
+		while stack:
+			gate = stack.pop()
+			if gate.id in seen: continue
+			seen.add(gate.id)
+			if gate.getType() == -1:
+				ret.extend(gate.getInputs(ctrl))
+			else:
+				#reversed so that input1 is visited first
+				stack.extend(reversed(_directInputs(gate)))
+		return ret
 	
 	def __repr__(self):
 		return self.__str__()
@@ -112,6 +373,8 @@ class Gate(object):
 class Input(Gate):
 	"""Regular Inputs, can have values 0 or 1"""
 	
+	__slots__ = ('name', 'value', 'pos')
+	
 	def __init__(self, name):
 		self.name = name
 		self.set(0)
@@ -130,9 +393,6 @@ class Input(Gate):
 	def countGates(self, type):
 		return 0
 		
-	def getDict(self):
-		return []
-		
 	def getDepth(self):
 		return 0
 		
@@ -156,6 +416,8 @@ class Control(Input):
 	expects as part of its input and determine the behavior of the UC.
 	"""
 	
+	__slots__ = ()
+	
 	def __init__(self):
 		super(Control, self).__init__("c")
 		self.name += str(self.id)
@@ -167,85 +429,35 @@ class Control(Input):
 class NotGate(Gate):
 	"""Not Gate, outputs not(input)"""
 	
+	__slots__ = ('input1',)
+	
 	def __init__(self, input):
 		self.input1 = input
 		super(NotGate, self).__init__()
 		
-	def evaluate(self):
-		return 1 - self.input1.evaluate()
-	
-	def countGates(self, type):
-		if self.numGates[type] is None:
-			self.numGates[type] = (1 if type==0 else 0)+self.input1.countGates(type)
-		return self.numGates[type]
-	
-	def getDependency(self):
-		if self.input1.getType() == -1: 	#is an Input
-			return [(self.id, set())]
-		return self.input1.getDependency()+[(self.id, {self.input1.id})]
-		
-	def getDict(self):
-		return self.input1.getDict()+[(self.id, self)]
-		
 	def getType(self):
 		"""Type used for simulation block control input"""
 		
 		return 0
 	
-	def getInputs(self, ctrl=False):
-		return self.input1.getInputs(ctrl)
-	
-	def getDepth(self):
-		return 1+self.input1.getDepth()
-	
 	def __str__(self):
 		return "-"+str(self.input1)
 	
 class AndGate(Gate):
 	"""And Gate, outputs (input1 and input2)"""
 	
+	__slots__ = ('input1', 'input2')
+	
 	def __init__(self, input1, input2):
 		self.input1 = input1
 		self.input2 = input2
 		super(AndGate, self).__init__()
 		
-	def evaluate(self):
-		return self.input1.evaluate() and self.input2.evaluate()
-	
-	def countGates(self, type):
-		if self.numGates[type] is None:
-			self.numGates[type] = (1 if type==1 else 0)+self.input1.countGates(type)+self.input2.countGates(type)
-		return self.numGates[type]
-	
-		if type in (None, 1): ret = 1
-		else: ret = 0
-		return ret+self.input1.countGates(type)+self.input2.countGates(type)
-		
-	def getDependency(self):
-		dependsOn = []
-		ret = []
-		if self.input1.getType() != -1:		#is not an Input
-			dependsOn.append(self.input1.id)
-			ret += self.input1.getDependency()
-		if self.input2.getType() != -1:		#is not an Input
-			dependsOn.append(self.input2.id)
-			ret += self.input2.getDependency()
-		return ret+[(self.id, set(dependsOn))]
-		
-	def getDict(self):
-		return self.input1.getDict() + self.input2.getDict() + [(self.id, self)]
-		
 	def getType(self):
 		"""Type used for simulation block control input"""
 		
 		return 1
 		
-	def getInputs(self, ctrl=False):
-		return self.input1.getInputs(ctrl)+self.input2.getInputs(ctrl)
-		
-	def getDepth(self):
-		return 1+max(self.input1.getDepth(), self.input2.getDepth())
-	
 	def __str__(self):
 		return "("+str(self.input1)+"&"+str(self.input2)+")"
 	
@@ -263,7 +475,7 @@ if __name__ == '__main__':
 	#countGates
 	print 'Number of Gates: %d'%(a.countGates())
 
-	for test in list(product([0,1], repeat=inputLength)):
+	for test in product([0,1], repeat=inputLength):
 		test = list(test)
 		circuitResult = a.evaluate(test)
 		correct = (not (test[0] and test[1]) and (not test[2] and test[3]))
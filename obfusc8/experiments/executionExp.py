@@ -14,6 +14,7 @@ from sage.all import *
 import sys, os
 import logging
 import cPickle
+import gzip
 import sqlite3
 from itertools import product
 
@@ -57,41 +58,48 @@ def experiment(pList, fileFormatString, experimentName):
 			circuits = cLists['%d%d'%(inputLength, numberOfGates)]
 			
 			logging.warning('Loading %s'%filename)
-			with open('results/%s/%s.pkl'%(experimentName, filename), 'rb') as input:
+			with gzip.open('results/%s/%s.pkl.gz'%(experimentName, filename), 'rb') as input:
 				evaluator = cPickle.load(input)
 			logging.warning('%s'%evaluator)
 			
-			circuitTimes = []
-			results = []
-			correct = []
+			#accumulated average times per input and result counts
+			circuitTime = 0.0
+			evalTime = 0.0
+			numCorrect = 0
+			numWrong = 0
 			
 			for crc in circuits:
-				ctrlInput = UniversalCircuit.obtainCtrlInput(crc) if experimentName is not 'rbpsFix' else []
-				for test in list(product([0,1], repeat=inputLength)):
-					inp = list(test)
-					with Timer() as t:
-						expectedResult = crc.evaluate(inp)
-					circuitTimes.append(t.secs)
-					with Timer() as t:
-						result = evaluator.evaluate(ctrlInput+inp)
-					results.append(t.secs)
-					correct.append(result==expectedResult)
-					logging.info('%s => %d in %f seconds (this is %s)'%(inp, result, t.secs, result==expectedResult))
+				ctrlInput = tuple(UniversalCircuit.obtainCtrlInput(crc)) if experimentName != 'rbpsFix' else ()
+				tests = list(product([0,1], repeat=inputLength))
+				#build the complete evaluator inputs outside of the timed loop
+				evalInputs = [ctrlInput+test for test in tests]
+				#evaluate the circuit on all inputs at once
+				with Timer() as t:
+					expectedResults = crc.evaluateTruthTable()
+				circuitTime += t.secs/len(tests)
+				#time all evaluations together, single ones are below the timer resolution
+				with Timer() as t:
+					evalResults = [evaluator.evaluate(inp) for inp in evalInputs]
+				evalTime += t.secs/len(tests)
+				for inp, result, expectedResult in zip(tests, evalResults, expectedResults):
+					if result==expectedResult: numCorrect += 1
+					else: numWrong += 1
+					logging.info('%s => %d (this is %s)', inp, result, result==expectedResult)
 			
-			averageCircuit = sum(circuitTimes)/len(circuitTimes)
+			averageCircuit = circuitTime/len(circuits)
 			logging.info('Average circuit evaluation time: %f'%averageCircuit)
 			
-			average = sum(results)/len(results)
+			average = evalTime/len(circuits)
 			logging.info('Average evaluation time: %f'%average)
 
-			logging.info('Correct result %d times'%correct.count(True))
-			logging.info('Wrong result %d times'%correct.count(False))
+			logging.info('Correct result %d times'%numCorrect)
+			logging.info('Wrong result %d times'%numWrong)
 			
 			#log into database
 			logging.warn('Writing to database')
 			c = resultsDB.cursor()
 			
-			dbInput = (filename, averageCircuit, average, correct.count(True), correct.count(False))
+			dbInput = (filename, averageCircuit, average, numCorrect, numWrong)
 			placeholders = ','.join(['?']*len(dbInput))
 			c.execute('INSERT INTO %sEval Values (%s)'%(experimentName, placeholders), dbInput)
 			
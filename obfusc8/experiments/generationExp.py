@@ -20,6 +20,7 @@ import sys, os, errno
 import logging
 from guppy import hpy
 import cPickle
+import gzip
 import sqlite3
 
 from obfusc8.obf import *
@@ -61,15 +62,16 @@ def experiment(expFunction, pList, fileFormatString, experimentName, inputFilesF
 			obj, dbInfo, execTime = expFunction(params, inputFilesFormatString)
 			
 			#Saving
-			logging.warn('Saving object to %s.pkl'%path)
-			with open(path+'.pkl', 'wb') as output:
+			#the pickled matrices are verbose, fast compression pays off when loading
+			logging.warn('Saving object to %s.pkl.gz'%path)
+			with gzip.open(path+'.pkl.gz', 'wb', compresslevel=1) as output:
 				cPickle.dump(obj, output, -1)
 			
 			#log into database
 			logging.warn('Writing to database')
 			c = resultsDB.cursor()
 			
-			filesize = os.path.getsize(path+'.pkl')
+			filesize = os.path.getsize(path+'.pkl.gz')
 			logging.info('Filesize: %d'%filesize)
 			logging.info('Generation Time: %f'%execTime)
 			
@@ -146,7 +148,7 @@ def bp_exp(params, inputFilesFormatString):
 	ioGen = IndistinguishabilityObfuscationGenerator(inputLength, numberOfGates, 100)
 	
 	logging.info('Loading uc_%d_%d'%params)
-	with open('results/'+inputFilesFormatString%params, 'rb') as input:
+	with gzip.open('results/'+inputFilesFormatString%params, 'rb') as input:
 		ioGen.uc = cPickle.load(input)
 	logging.warning('Loading successful: %s'%ioGen.uc)
 	logging.warning('Estimated BP size: %d'%BranchingProgram.estimateBPSize(ioGen.uc))
@@ -177,7 +179,7 @@ def rbpSimple_exp(params, inputFilesFormatString):
 	if matDimensions==-1: matDimensions=None
 	
 	logging.info('Loading bp_%d_%d'%(inputLength, numberOfGates))
-	with open('results/'+inputFilesFormatString%(inputLength, numberOfGates), 'rb') as input:
+	with gzip.open('results/'+inputFilesFormatString%(inputLength, numberOfGates), 'rb') as input:
 		ioGen.bp = cPickle.load(input)
 	logging.warning('Loading successful: %s'%ioGen.bp)
 	
@@ -205,7 +207,7 @@ def bpFix_exp(params, inputFilesFormatString):
 	ioGen = IndistinguishabilityObfuscationGenerator(inputLength, numberOfGates, 100)
 	
 	logging.info('Loading bp_%d_%d'%(inputLength, numberOfGates))
-	with open('results/'+inputFilesFormatString%(inputLength, numberOfGates), 'rb') as input:
+	with gzip.open('results/'+inputFilesFormatString%(inputLength, numberOfGates), 'rb') as input:
 		ioGen.bp = cPickle.load(input)
 	logging.warning('Loading successful: %s'%ioGen.bp)
 	
@@ -292,7 +294,7 @@ if __name__ == '__main__':
 			numSimGates integer, length integer, memoryUsage integer, fileSize integer, genTime real)''')
 		resultsDB.commit()
 		
-		experiment(bp_exp, smallUCList, 'bp_{0}_{1}', 'bps', 'ucs/uc_%d_%d.pkl')
+		experiment(bp_exp, smallUCList, 'bp_{0}_{1}', 'bps', 'ucs/uc_%d_%d.pkl.gz')
 		
 	if 2 in testList:
 		#---------------- Simple RBP Tests ------------------
@@ -304,7 +306,7 @@ if __name__ == '__main__':
 			numSimGates integer, matrixDimensions integer, p integer, length integer, memoryUsage integer, fileSize integer, genTime real)''')
 		resultsDB.commit()
 		
-		experiment(rbpSimple_exp, ukDimPList, 'rbp_{0}_{1}_{2}_{3}', 'rbps', 'bps/bp_%d_%d.pkl')
+		experiment(rbpSimple_exp, ukDimPList, 'rbp_{0}_{1}_{2}_{3}', 'rbps', 'bps/bp_%d_%d.pkl.gz')
 
 	if 3 in testList:
 		#---------------- Fix BP Tests ------------------
@@ -316,7 +318,7 @@ if __name__ == '__main__':
 			numSimGates integer, length integer, memoryUsage integer, fileSize integer, genTime real)''')
 		resultsDB.commit()
 		
-		experiment(bpFix_exp, bpFixParams, 'bpFix_{0}_{1}', 'bpsFix', 'bps/bp_%d_%d.pkl')
+		experiment(bpFix_exp, bpFixParams, 'bpFix_{0}_{1}', 'bpsFix', 'bps/bp_%d_%d.pkl.gz')
 	
 	if 4 in testList:
 		#---------------- RBP matrix sizes Tests ------------------
@@ -328,7 +330,7 @@ if __name__ == '__main__':
 			numSimGates integer, matrixDimensions integer, p integer, length integer, memoryUsage integer, fileSize integer, genTime real)''')
 		resultsDB.commit()
 		
-		experiment(rbpSimple_exp, rbpDimList, 'rbp_{0}_{1}_{2}_{3}', 'rbpMatSize', 'bps/bp_%d_%d.pkl')
+		experiment(rbpSimple_exp, rbpDimList, 'rbp_{0}_{1}_{2}_{3}', 'rbpMatSize', 'bps/bp_%d_%d.pkl.gz')
 	
 	#breakdown	
 	resultsDB.close()
\ No newline at end of file
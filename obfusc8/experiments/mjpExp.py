@@ -5,11 +5,26 @@ Also investigates memory needed for setup and the growth of the encode elements.
 
 import sqlite3
 import logging
+import timeit
 from guppy import hpy
 
-from obfusc8.timer import Timer
+from obfusc8.experiments.timer import Timer
 from obfusc8.mjp import *
 
+def timePerCall(func, minTime=0.2):
+	"""Measure the average execution time of func
+	
+	The number of calls is increased tenfold until they take at least
+	minTime seconds together (same as timeit.Timer.autorange)
+	"""
+	
+	timer = timeit.Timer(func)
+	number = 1
+	while True:
+		total = timer.timeit(number)
+		if total >= minTime: return total/number
+		number *= 10
+
 #database setup
 resultsDB = sqlite3.connect('results.db')
 c = resultsDB.cursor()
@@ -34,8 +49,6 @@ levels = [10, 20, 30, 40, 50, 100, 200, 300, 400, 500, 600, 700, 800, 900, 1000]
 
 paramList = [(dim, lvl) for dim in dimList for lvl in levels]
 
-repetitions = 100
-
 hp = hpy()
 
 for dim, lvl in paramList:
@@ -51,30 +64,34 @@ for dim, lvl in paramList:
 	logging.info('Time elapsed: %f'%t.secs)
 	
 	c.execute('INSERT INTO mjpSetup Values (?,?,?,?)', (dim, lvl, memoryUsage, t.secs))
-	resultsDB.commit()
 	
-	for _ in range(10):
+	#rows are written at once after all runs for this parameter
+	encodeRows = []
+	addRows = []
+	multRows = []
+	ring = Integers(mjp.getP())
+	for run in range(10):
 		#------------------------------------------------------------
 		#b) encode one element (at highest level = slowest)
 		logging.warning('Encoding start')
 		
-		ring = Integers(mjp.getP())
-		
-		hp.setrelheap()
+		#walking the heap is slow and the sizes only depend on (dim, lvl),
+		#so the memory is only measured in the first run
+		if run == 0: hp.setrelheap()
 		add1 = ring.random_element()
 		add2 = ring.random_element()
 		mult1 = ring.random_element()
 		mult2 = ring.random_element()
-		before = hp.heap().size / 4
+		if run == 0: before = hp.heap().size / 4
 		
-		hp.setrelheap()
+		if run == 0: hp.setrelheap()
 		with Timer() as t:
 			add1Enc = mjp.encode(add1, range(lvl))
 			add2Enc = mjp.encode(add2, range(lvl))
 			mult1Enc = mjp.encode(mult1, range(lvl/2))
 			mult2Enc = mjp.encode(mult2, range(lvl/2, lvl))
 		execTime = t.secs / 4
-		after = hp.heap().size / 4
+		if run == 0: after = hp.heap().size / 4
 		
 		increase = after/(before*1.0)
 		
@@ -83,35 +100,29 @@ for dim, lvl in paramList:
 		logging.info('Increase: %f'%increase)
 		logging.info('Time elapsed each: %f'%execTime)
 		
-		c.execute('INSERT INTO mjpEncode Values (?,?,?,?,?,?)', (dim, lvl, before, after, increase, execTime))
-		resultsDB.commit()
+		encodeRows.append((dim, lvl, before, after, increase, execTime))
 
 		#------------------------------------------------------------
 		#c) add/multiply two elements (add: highest, multiply: to highest?)
 		logging.warning('Evaluation start')
 		
 		#add
-		with Timer() as t:
-			for _ in range(repetitions): resAdd = add1 + add2
-		timePlainAdd = t.secs / repetitions
-		with Timer() as t:
-			for _ in range(repetitions): resAddEnc = add1Enc + add2Enc
-		timeEncAdd = t.secs / repetitions
+		timePlainAdd = timePerCall(lambda: add1 + add2)
+		timeEncAdd = timePerCall(lambda: add1Enc + add2Enc)
 		increaseAdd = timeEncAdd/(timePlainAdd*1.0)
 		logging.info('add plain %f, enc %f => increase %f'%(timePlainAdd, timeEncAdd, increaseAdd))
-		c.execute('INSERT INTO mjpAdd Values (?,?,?,?,?)', (dim, lvl, timePlainAdd, timeEncAdd, increaseAdd))
-		resultsDB.commit()
+		addRows.append((dim, lvl, timePlainAdd, timeEncAdd, increaseAdd))
 		
 		#multiply
-		with Timer() as t:
-			for _ in range(repetitions): resMult = mult1 + mult2
-		timePlainMult = t.secs / repetitions
-		with Timer() as t:
-			for _ in range(repetitions): resMultEnc = mult1Enc + mult2Enc
-		timeEncMult = t.secs / repetitions
+		timePlainMult = timePerCall(lambda: mult1 * mult2)
+		timeEncMult = timePerCall(lambda: mult1Enc * mult2Enc)
 		increaseMult = timeEncMult/(timePlainMult*1.0)
 		logging.info('mult plain %f, enc %f => increase %f'%(timePlainMult, timeEncMult, increaseMult))
-		c.execute('INSERT INTO mjpMultiply Values (?,?,?,?,?)', (dim, lvl, timePlainMult, timeEncMult, increaseMult))
-		resultsDB.commit()
+		multRows.append((dim, lvl, timePlainMult, timeEncMult, increaseMult))
+	
+	c.executemany('INSERT INTO mjpEncode Values (?,?,?,?,?,?)', encodeRows)
+	c.executemany('INSERT INTO mjpAdd Values (?,?,?,?,?)', addRows)
+	c.executemany('INSERT INTO mjpMultiply Values (?,?,?,?,?)', multRows)
+	resultsDB.commit()
 	
 resultsDB.close()
\ No newline at end of file
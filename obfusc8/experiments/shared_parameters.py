@@ -22,12 +22,12 @@ rbpDimList = [(2, 1, dim, 1015747) for dim in [2, 3, 4, 5, 10, 20, 30, 40, 50, 6
 #all possible circuits for particular #gates and #inputs
 inputs = [Input('x') for _ in range(0, maxInputs)]
 cl21 = [Circuit(AndGate(inputs[0], inputs[1]))]
-cl22 = map(Circuit, [NotGate(AndGate(inputs[0], inputs[1])), AndGate(NotGate(inputs[0]), inputs[1]), AndGate(inputs[0], NotGate(inputs[1]))])
+cl22 = [Circuit(gate) for gate in [NotGate(AndGate(inputs[0], inputs[1])), AndGate(NotGate(inputs[0]), inputs[1]), AndGate(inputs[0], NotGate(inputs[1]))]]
 cl32 = [Circuit(AndGate(AndGate(inputs[0], inputs[1]), inputs[2]))]
 cl23 = [Circuit(AndGate(NotGate(inputs[0]), NotGate(inputs[1])))]
-cl33 = map(Circuit, [NotGate(AndGate(AndGate(inputs[0], inputs[1]), inputs[2])), AndGate(NotGate(AndGate(inputs[0], inputs[1])), 
+cl33 = [Circuit(gate) for gate in [NotGate(AndGate(AndGate(inputs[0], inputs[1]), inputs[2])), AndGate(NotGate(AndGate(inputs[0], inputs[1])), 
 	inputs[2]), AndGate(AndGate(inputs[0], inputs[1]), NotGate(inputs[2])), AndGate(AndGate(NotGate(inputs[0]), inputs[1]), inputs[2]), 
-	AndGate(AndGate(inputs[0], NotGate(inputs[1])), inputs[2])])
+	AndGate(AndGate(inputs[0], NotGate(inputs[1])), inputs[2])]]
 cl43 =	[Circuit(AndGate(AndGate(AndGate(inputs[0], inputs[1]), inputs[2]), inputs[3]))]
 
 cLists = {'21':cl21, '22':cl22, '32':cl32, '23':cl23, '33':cl33, '43':cl43}
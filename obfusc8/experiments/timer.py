@@ -1,19 +1,20 @@
 """Simple class for measuring execution times (source: http://www.huyng.com/posts/python-performance-analysis/)
 """
 
-import time
+#default_timer is the most precise wall clock available on each platform
+from timeit import default_timer
 
 class Timer(object):
     def __init__(self, verbose=False):
         self.verbose = verbose
 
     def __enter__(self):
-        self.start = time.clock()
+        self.start = default_timer()
         return self
 
     def __exit__(self, *args):
-        self.end = time.clock()
+        self.end = default_timer()
         self.secs = self.end - self.start
         self.msecs = self.secs * 1000  # millisecs
         if self.verbose:
-            print 'elapsed time: %f ms' % self.msecs
+            print('elapsed time: %f ms' % self.msecs)
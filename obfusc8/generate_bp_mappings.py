@@ -6,14 +6,17 @@ Additionally it contains two earlier versions of the Branching Program
 generation for explanatory purposes.
 
 !!! 
-Note that the earlier versions of Branching Program generation do not
-work with the main code anymore, as the BP representation has changed.
+Note that the earlier versions of Branching Program generation are much
+slower than the mapping based generation in BranchingProgram.fromCircuit.
 Nonetheless they are useful for understanding what the new mapping code
 is doing internally.
 !!!
 """
 
-from numpy import array, dot, where
+from __future__ import print_function
+from numpy import array, empty, stack, zeros, intp, uint8
+
+from obfusc8.bp import BranchingProgram, _perm2cycle
 
 #------------- helpers ---------------------
 
@@ -29,30 +32,93 @@ def _special1(): return array([[1,0,0,0,0],[0,0,0,1,0],[0,0,0,0,1],[0,1,0,0,0],[
 def _special2(): return array([[1,0,0,0,0],[0,1,0,0,0],[0,0,0,0,1],[0,0,1,0,0],[0,0,0,1,0]]) 	#(243)
 def _special3(): return array([[1,0,0,0,0],[0,1,0,0,0],[0,0,0,1,0],[0,0,0,0,1],[0,0,1,0,0]]) 	#(234)
 
-def _matrix2cycle(permMatrix):
-	"""Helper function to get cycle notation of permutation matrix"""
+def _vector(permMatrix):
+	"""Helper function to get the permutation vector of a permutation matrix
 	
-	lookedAt = [0]*permMatrix.shape[0]
-	ret = ''
-	indices = list(where(permMatrix==1)[1])
+	p[i] = j iff M[i,j] = 1, so the matrix product A*B becomes b[a]
+	"""
 	
-	while not all(lookedAt):
-		start = lookedAt.index(0)
-		
-		if indices[start] != start:		#doesn't point to itself
-			ret += '('+str(start)
-			
-			curr = indices[start]
-			while start!=curr:
-				ret += str(curr)
-				lookedAt[curr] = 1
-				curr = indices[curr]
-			ret += ')'
-			
-		lookedAt[start] = 1
+	return permMatrix.argmax(1).astype(uint8)
+
+def _key(perm):
+	"""Helper function to get a hashable key of a permutation vector"""
 	
-	if ret=='': ret='e'
-	return ret
+	return perm.tobytes()
+
+def _constant(permMatrix):
+	"""Helper function to get a read-only permutation vector of a permutation matrix"""
+	
+	perm = _vector(permMatrix)
+	perm.flags.writeable = False
+	return perm
+
+#permutation vectors of the matrices above, built once and shared by all generators
+_IDENTITY = _constant(_identity())
+_NORMAL = _constant(_normal())
+_NORMAL_INV = _constant(_normalInv())
+_NI2N = _constant(_ni2n())
+_N2SEC = _constant(_n2sec())
+_N2SEC_INV = _constant(_n2secInv())
+_SEC2SI = _constant(_sec2si())
+_SPECIAL1 = _constant(_special1())
+_SPECIAL2 = _constant(_special2())
+_SPECIAL3 = _constant(_special3())
+
+def _changeBoth(ins, a, b):
+	"""Helper function to apply a*P*b in place to all instructions P of ins
+	
+	ins is an array of permutation vectors of shape (2, N, 5), holding
+	the instructions for input bit 0 and 1. a and b are permutation vectors.
+	"""
+	
+	ins[...] = b[ins[:, :, a]]
+
+def _cached(gate, ins, indexList, start, cache):
+	"""Helper function to copy the cached instructions of gate to position start
+	
+	cache contains the IDs of all gates that are used more than once, with
+	their generated instructions once available. Returns the end position
+	or None, if gate has not been generated yet.
+	"""
+	
+	if cache.get(gate.id) is None: return None
+	cachedIns, cachedIndices = cache[gate.id]
+	end = start+len(cachedIndices)
+	ins[:, start:end] = cachedIns
+	indexList[start:end] = cachedIndices
+	return end
+
+def _store(gate, ins, indexList, start, end, cache):
+	"""Helper function to cache the instructions of gate if it is used more than once"""
+	
+	#copies are needed, since the parent gates transform the instructions in place
+	if gate.id in cache:
+		cache[gate.id] = (ins[:, start:end].copy(), indexList[start:end].copy())
+
+def _oldC2BP(circuit, getInstructions):
+	"""Helper function to generate the complete BP with one of the old versions"""
+	
+	#gates used more than once are only generated once, see _cached
+	uses = {}
+	for gate in circuit.getDict().values():
+		for input in ([gate.input1] if gate.getType() == 0 else [gate.input1, gate.input2]):
+			uses[input.id] = uses.get(input.id, 0) + 1
+	cache = dict((id, None) for id, count in uses.iteritems() if count > 1)
+	
+	#all instructions are written into one preallocated array
+	length = BranchingProgram.estimateBPSize(circuit)
+	ins = empty((2, length, 5), dtype=uint8)
+	indexList = empty(length, dtype=intp)
+	getInstructions(circuit.outputGate, ins, indexList, 0, cache)
+	#make sure one perm is the identity
+	ins[:, -1] = _NORMAL_INV
+	indexList[-1] = 0
+	return BranchingProgram(ins[0], ins[1], indexList.tolist(), _NORMAL_INV, _IDENTITY)
+
+def _matrix2cycle(permMatrix):
+	"""Helper function to get cycle notation of permutation matrix"""
+	
+	return _perm2cycle(_vector(permMatrix))
 	
 #------------- First version ---------------------
 # This version is essentially a recursive implementation of the inductive
@@ -66,47 +132,55 @@ def _matrix2cycle(permMatrix):
 #[1] N. Kunze. "A Qualitative Study of Indistinguishability Obfuscation." BA thesis. Technische Universität München, 2014.
 
 def oldC2BP1(circuit):
-	instructions, indexList = _getInstructions1(circuit.outputGate)
-	#make sure one perm is the identity
-	instructions.append((_normalInv(), _normalInv()))
-	ins0 = [tpl[0] for tpl in instructions]
-	ins1 = [tpl[1] for tpl in instructions]
-	indexList.append(0)
-	return BranchingProgram(ins0, ins1, indexList, _normalInv(), _identity())
+	return _oldC2BP(circuit, _getInstructions1)
+	
+def _getInstructions1(gate, ins, indexList, start, cache):
+	"""Write the instructions for gate to position start onwards, return the end position"""
+	
+	end = _cached(gate, ins, indexList, start, cache)
+	if end is not None: return end
 	
-def _getInstructions1(gate):
 	#Input
 	if gate.getType() == -1:
-		ins = (_identity(), _normal())
-		return ([ins], [gate.pos])
+		ins[0, start] = _IDENTITY
+		ins[1, start] = _NORMAL
+		indexList[start] = gate.pos
+		return start+1
 	
 	#NotGate
 	elif gate.getType() == 0:
-		instructions, indexList = _getInstructions1(gate.input1)
+		end = _getInstructions1(gate.input1, ins, indexList, start, cache)
 		#apply o^-1 in the end
-		instructions[-1] = tuple(dot(instructions[-1][i],_normalInv()) for i in range(2))
+		ins[:, end-1] = _NORMAL_INV[ins[:, end-1]]
 		#normalize program
-		a = _ni2n()
-		instructions = [_changeBoth(ins, a, a) for ins in instructions]
-		return (instructions, indexList)
+		_changeBoth(ins[:, start:end], _NI2N, _NI2N)
+		_store(gate, ins, indexList, start, end, cache)
+		return end
 		
 	#AndGate
 	elif gate.getType() == 1:
-		instructions1, indexList1 = _getInstructions1(gate.input1)
-		instructions2, indexList2 = _getInstructions1(gate.input2)
+		end1 = _getInstructions1(gate.input1, ins, indexList, start, cache)
+		end2 = _getInstructions1(gate.input2, ins, indexList, end1, cache)
+		end3 = end2+(end1-start)
+		end4 = end3+(end2-end1)
+		
+		#copy both sub programs for a3 and a4
+		ins[:, end2:end3] = ins[:, start:end1]
+		ins[:, end3:end4] = ins[:, end1:end2]
+		indexList[end2:end4] = indexList[start:end2]
 		
-		#assemble new program
-		a1 = instructions1
-		a2 = [_changeBoth(ins, _n2secInv(), _n2sec()) for ins in instructions2]
-		a3 = [_changeBoth(ins, _ni2n(), _ni2n()) for ins in instructions1]
-		a4 = [_changeBoth(ins, _sec2si(), _sec2si()) for ins in a2]
+		#assemble new program, a1 is the first sub program as it is
+		_changeBoth(ins[:, end1:end2], _N2SEC_INV, _N2SEC)
+		_changeBoth(ins[:, end2:end3], _NI2N, _NI2N)
+		#a4 is a2 with _sec2si applied
+		_changeBoth(ins[:, end3:end4], _N2SEC_INV, _N2SEC)
+		_changeBoth(ins[:, end3:end4], _SEC2SI, _SEC2SI)
 		
 		#normalize new program
-		newIns = a1 + a2 + a3 + a4
-		newIns = [_changeBoth(ins, _sec2si(), _sec2si()) for ins in newIns]
-		newIndexList = indexList1 + indexList2 + indexList1 + indexList2
+		_changeBoth(ins[:, start:end4], _SEC2SI, _SEC2SI)
 		
-		return (newIns, newIndexList)
+		_store(gate, ins, indexList, start, end4, cache)
+		return end4
 		
 	raise ValueError
 	
@@ -118,52 +192,52 @@ def _getInstructions1(gate):
 # program a1+a2+a3+a4 by applying _sec2si, each a_i is already normalized.
 
 def oldC2BP2(circuit):
-	instructions, indexList = _getInstructions2(circuit.outputGate)
-	#make sure one perm is the identity
-	instructions.append((_normalInv(), _normalInv()))
-	ins0 = [tpl[0] for tpl in instructions]
-	ins1 = [tpl[1] for tpl in instructions]
-	indexList.append(0)
-	return BranchingProgram(ins0, ins1, indexList, _normalInv(), _identity())
+	return _oldC2BP(circuit, _getInstructions2)
+	
+def _getInstructions2(gate, ins, indexList, start, cache):
+	"""Write the instructions for gate to position start onwards, return the end position"""
+	
+	end = _cached(gate, ins, indexList, start, cache)
+	if end is not None: return end
 	
-def _getInstructions2(gate):
 	#Input
 	if gate.getType() == -1:
-		ins = (_identity(), _normal())
-		return ([ins], [gate.pos])
+		ins[0, start] = _IDENTITY
+		ins[1, start] = _NORMAL
+		indexList[start] = gate.pos
+		return start+1
 	
 	#NotGate
 	elif gate.getType() == 0:
-		instructions, indexList = _getInstructions2(gate.input1)
+		end = _getInstructions2(gate.input1, ins, indexList, start, cache)
 		#apply o^-1 in the end
-		instructions[-1] = tuple(dot(instructions[-1][i],_normalInv()) for i in range(2))
+		ins[:, end-1] = _NORMAL_INV[ins[:, end-1]]
 		#normalize program
-		a = _ni2n()
-		instructions = [_changeBoth(ins, a, a) for ins in instructions]
-		return (instructions, indexList)
+		_changeBoth(ins[:, start:end], _NI2N, _NI2N)
+		_store(gate, ins, indexList, start, end, cache)
+		return end
 	
 	#AndGate
 	elif gate.getType() == 1:
-		instructions1, indexList1 = _getInstructions2(gate.input1)
+		end1 = _getInstructions2(gate.input1, ins, indexList, start, cache)
+		end2 = _getInstructions2(gate.input2, ins, indexList, end1, cache)
+		end3 = end2+(end1-start)
+		end4 = end3+(end2-end1)
 		
-		#transformation for new program + normalization applied at the same time
-		a = _sec2si()
-		a1 = [_changeBoth(ins, a, a) for ins in instructions1]
-		a = _special1()
-		a3 = [_changeBoth(ins, a, a) for ins in instructions1]
-		instructions1 = None
+		#copy both sub programs for a3 and a4
+		ins[:, end2:end3] = ins[:, start:end1]
+		ins[:, end3:end4] = ins[:, end1:end2]
+		indexList[end2:end4] = indexList[start:end2]
 		
-		instructions2, indexList2 = _getInstructions2(gate.input2)
+		#transformation for new program + normalization applied at the same time
+		_changeBoth(ins[:, start:end1], _SEC2SI, _SEC2SI)
+		_changeBoth(ins[:, end2:end3], _SPECIAL1, _SPECIAL1)
 		
-		a = _special2()
-		b = _special3()
-		a2 = [_changeBoth(ins, a, b) for ins in instructions2]
-		a = _n2secInv()
-		b = _n2sec()
-		a4 = [_changeBoth(ins, a, b) for ins in instructions2]
-		instructions2 = None
+		_changeBoth(ins[:, end1:end2], _SPECIAL2, _SPECIAL3)
+		_changeBoth(ins[:, end3:end4], _N2SEC_INV, _N2SEC)
 		
-		return (a1+a2+a3+a4, indexList1+indexList2+indexList1+indexList2)
+		_store(gate, ins, indexList, start, end4, cache)
+		return end4
 		
 	raise ValueError
 
@@ -183,6 +257,29 @@ def _getInstructions2(gate):
 # Since integers use much less memory than the 5x5 permutation matrices,
 # using these IDs greatly alleviates the memory problem.
 
+def _operations():
+	"""The 6 operations as (left, right) permutation vectors
+	
+	Operation i maps the permutation P to left*P*right, in the order
+	of the mappings (NotGate only last, NotGate all, AndGate a1, a3, a2, a4)
+	"""
+	
+	return [
+		#--- NotGate ---
+		#only last
+		(_NI2N, _NI2N[_NORMAL_INV]),
+		#all
+		(_NI2N, _NI2N),
+		#--- AndGate ---
+		#a1
+		(_SEC2SI, _SEC2SI),
+		#a3
+		(_SPECIAL1, _SPECIAL1),
+		#a2
+		(_SPECIAL2, _SPECIAL3),
+		#a4
+		(_N2SEC_INV, _N2SEC)]
+
 def getPossiblePerms():
 	"""Generate a list with all possible permutations in S_5.
 
@@ -190,106 +287,51 @@ def getPossiblePerms():
 	occur during the Branching Program generation process to the permutations
 	that were already found, until no new permutations form. The unique ID
 	of each permutation is simply its position in said list.
+	
+	Returns a dictionary mapping the key (see _key) of each permutation to
+	its ID and the list of permutation vectors.
 	"""
 
-	permList = [_matrix2cycle(_identity()), _matrix2cycle(_normal())]
-	string2Perm = {_matrix2cycle(_identity()):_identity(), _matrix2cycle(_normal()):_normal()}
+	operations = _operations()
+	id2perm = [_IDENTITY, _NORMAL]
+	permIds = {_key(id2perm[0]):0, _key(id2perm[1]):1}
 	lenOld = 0
 	
-	def addIfNew():
-		newPermS = _matrix2cycle(newPerm)
-		if not newPermS in permList:
-			permList.append(newPermS)
-			string2Perm[newPermS] = newPerm
-	
 	#repeat until we didn't find anything new
-	while lenOld < len(permList):
-		lenOld = len(permList)
-		for permS in permList:
-			perm = string2Perm[permS]
-			
-			#--- NotGate ---
-			#only last
-			newPerm = dot(dot(_ni2n(), dot(perm, _normalInv())), _ni2n())
-			addIfNew()
-			
-			#all
-			newPerm = dot(dot(_ni2n(), perm), _ni2n())
-			addIfNew()
-			
-			#--- AndGate ---
-			#a1
-			newPerm = dot(dot(_sec2si(), perm), _sec2si())
-			addIfNew()
-			
-			#a3
-			newPerm = dot(dot(_special1(), perm), _special1())
-			addIfNew()
-			
-			#a2
-			newPerm = dot(dot(_special2(), perm), _special3())
-			addIfNew()
-			
-			#a4
-			newPerm = dot(dot(_n2secInv(), perm), _n2sec())
-			addIfNew()
+	while lenOld < len(id2perm):
+		lenOld = len(id2perm)
+		for perm in id2perm:
+			for left, right in operations:
+				#left*perm*right as composition of permutation vectors
+				newPerm = right[perm[left]]
+				newPermKey = _key(newPerm)
+				if not newPermKey in permIds:
+					permIds[newPermKey] = len(id2perm)
+					id2perm.append(newPerm)
 	
-	return (permList, string2Perm)
+	return (permIds, id2perm)
 	
-def calculateMappings(permList, string2Perm):
+def calculateMappings(permIds, id2perm):
 	"""Take the output of getPossiblePerms() and compute the mappings
 	for each of the 6 needed operations.
+	
+	Returns a (6, #perms) array, so that a whole array of IDs can be
+	mapped at once by indexing: mappings[op][ids]
 	"""
 
-	mappings = [range(len(permList)) for _ in range(6)]
+	mappings = zeros((6, len(id2perm)), dtype=uint8)
+	perms = stack(id2perm)
 	
-	for permInd, permS in zip(range(len(permList)), permList):
-		perm = string2Perm[permS]
-
-		#--- NotGate ---
-		#only last
-		newPerm = dot(dot(_ni2n(), dot(perm, _normalInv())), _ni2n())
-		newPermS = _matrix2cycle(newPerm)
-		newPermInd = permList.index(newPermS)
-		mappings[0][permInd] = newPermInd
-		
-		#all
-		newPerm = dot(dot(_ni2n(), perm), _ni2n())
-		newPermS = _matrix2cycle(newPerm)
-		newPermInd = permList.index(newPermS)
-		mappings[1][permInd] = newPermInd
-		
-		#--- AndGate ---
-		#a1
-		newPerm = dot(dot(_sec2si(), perm), _sec2si())
-		newPermS = _matrix2cycle(newPerm)
-		newPermInd = permList.index(newPermS)
-		mappings[2][permInd] = newPermInd
-		
-		#a3
-		newPerm = dot(dot(_special1(), perm), _special1())
-		newPermS = _matrix2cycle(newPerm)
-		newPermInd = permList.index(newPermS)
-		mappings[3][permInd] = newPermInd
-		
-		#a2
-		newPerm = dot(dot(_special2(), perm), _special3())
-		newPermS = _matrix2cycle(newPerm)
-		newPermInd = permList.index(newPermS)
-		mappings[4][permInd] = newPermInd
-		
-		#a4
-		newPerm = dot(dot(_n2secInv(), perm), _n2sec())
-		newPermS = _matrix2cycle(newPerm)
-		newPermInd = permList.index(newPermS)
-		mappings[5][permInd] = newPermInd
+	for op, (left, right) in enumerate(_operations()):
+		#left*perm*right for all permutations at once, only the ID lookup is done per row
+		mappings[op] = [permIds[_key(newPerm)] for newPerm in right[perms[:, left]]]
 		
 	return mappings
 
 if __name__=='__main__':
-	permList, string2Perm = getPossiblePerms()
-	print 'Mappings:'
-	print calculateMappings(permList, string2Perm)
-	print 'id2permList:'
-	print [string2Perm[s] for s in permList]
+	permIds, id2perm = getPossiblePerms()
+	print('Mappings:')
+	print(calculateMappings(permIds, id2perm).tolist())
+	print('id2permList:')
+	print([perm.tolist() for perm in id2perm])
 	
\ No newline at end of file
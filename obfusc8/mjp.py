@@ -50,9 +50,42 @@ Foundations of Computer Science (FOCS), 2013 IEEE 54th Annual Symposium on.
 IEEE. 2013, pp. 40-49.
 """
 
+from __future__ import print_function
 from sage.all import *
+from functools import reduce
 from operator import mul
+from itertools import imap, izip
 import logging
+import numpy
+
+def _squaredNorm(v):
+	"""Squared Euclidean norm of the coefficient vector of polynomial v, as exact integer"""
+	
+	#square and sum in C via imap(mul), only the conversion is done per coefficient
+	coeffs = map(int, v.list())
+	return sum(imap(mul, coeffs, coeffs))
+
+def _euclideanNorm(v):
+	"""Euclidean norm of the coefficient vector of polynomial v"""
+	
+	return float(_squaredNorm(v))**(0.5)
+
+def passesZeroTest(v, zeroTestBound):
+	"""Return True if the Euclidean norm of v = u*pzt is smaller than q^(7/8)
+	
+	zeroTestBound is JigsawPuzzle.zeroTestBound (q^7), so the test
+	norm^8 < q^7 is done exactly on integers
+	"""
+	
+	return _squaredNorm(v)**4 < zeroTestBound
+
+def _randomCoefficients(lower, upper, count):
+	"""List of count random integers with lower <= c < upper"""
+	
+	#one numpy call as long as the bounds fit into int64, otherwise one Sage call per coefficient
+	if upper <= 2**63:
+		return numpy.random.randint(lower, upper, size=count, dtype=numpy.int64).tolist()
+	return [ZZ.random_element(lower, upper) for i in range(count)]
 
 class JigsawPuzzle(object):
 	"""Multilinear Jigsaw Puzzles as defined in Appendix A"""
@@ -80,6 +113,8 @@ class JigsawPuzzle(object):
 		q_exp = int((self.__getM(dimensionality)**self.epsilon))*10
 		self.q = random_prime (2**(q_exp+1), lbound=2**q_exp)
 		logging.debug('%d < q < %d ==> q: %d'%(2**q_exp, 2**(q_exp+1), self.q))
+		#zero test: norm < q^(7/8) <=> norm^8 < q^7, compared exactly on integers
+		self.zeroTestBound = int(self.q)**7
 		
 		#generate ring R = Z[X]/(X^m+1) and R_q = Z_q[X]/(X^m+1) (m = dimension parameter)
 		self.R = QuotientRing(ZZ[self.x], self.x**self.m+1)
@@ -93,6 +128,14 @@ class JigsawPuzzle(object):
 		
 		#choose k random polynomials z_1, z_2, ..., z_k
 		self.zList = self.__getZList()
+		#product of all z_i, used for the zero test and encodings at the highest level
+		self.zProduct = reduce(mul, self.zList)
+		#inverse of the product of all z_i (i elem S) for each level set S, see __inverseDenominator
+		self.inverseDenominators = {}
+		#encodings at the highest level are the common case, prepare their denominator
+		self.__inverseDenominator(range(self.k))
+		#error coefficients of encodings are smaller than 2^O(m^delta)
+		self.errorBound = 2**(int(self.m**self.delta)/2)
 		
 		#generate zero test element
 		self.pzt = self.__getPzt()
@@ -103,28 +146,53 @@ class JigsawPuzzle(object):
 	def encode(self, a, levelSet):
 		"""Encode the element a at the level described by levelSet"""
 		
-		assert(all(i<self.k for i in levelSet))
+		return self.__encode(a, self.__inverseDenominator(levelSet))
+		
+	def __encode(self, a, inverseDenominator):
+		"""Encode the element a, the level is given by the inverse of the z_i product"""
 		
 		#reduce a modulo (g) to get small polynomial a^ in R
 		aHat = self.R(a).mod(self.g)
 
 		#choose error so that it is small and a^+e*g is discrete centered at the origin
 		#all coefficients smaller than 2^O(m^delta)
-		bound = 2**(int(self.m**self.delta)/2)
-		coeffs = [ZZ.random_element(0, bound) for i in range(self.m)]
-		error = sum([a*self.t**i for a, i in zip(coeffs, range(len(coeffs)))])
+		coeffs = _randomCoefficients(0, self.errorBound, self.m)
+		error = self.__polynomial(coeffs)
 		
 		#return: (a^ + e*g) / product of all z_i (i elem S)
 		numerator = self.R_q(aHat + error*self.g)
-		denominator = self.R_q(reduce(mul, [self.zList[i] for i in levelSet]))
 		
-		return numerator/denominator
+		return numerator*inverseDenominator
+		
+	def __inverseDenominator(self, levelSet):
+		"""Return 1 / product of all z_i (i elem levelSet), computed once per level set"""
+		
+		key = tuple(sorted(levelSet))
+		if key not in self.inverseDenominators:
+			assert(all(i<self.k for i in levelSet))
+			if len(key) == self.k and key == tuple(range(self.k)):
+				denominator = self.R_q(self.zProduct)
+			else:
+				denominator = self.R_q(reduce(mul, [self.zList[i] for i in levelSet]))
+			self.inverseDenominators[key] = 1/denominator
+		return self.inverseDenominators[key]
 		
 	def encodeMatrix(self, mat, levelSet):
 		"""Encode all elements of matrix at the level levelSet"""
 		
-		enc = self.encode
-		return mat.apply_map(lambda z: enc(z, levelSet))
+		#all elements share the same denominator
+		enc = self.__encode
+		inverseDenominator = self.__inverseDenominator(levelSet)
+		return mat.apply_map(lambda z: enc(z, inverseDenominator))
+	
+	def encodeMatrices(self, matrices, levelSets):
+		"""Encode each matrix at its level set, logging the progress every 20 matrices"""
+		
+		encoded = []
+		for mat, levelSet in izip(matrices, levelSets):
+			if len(encoded)%20 == 0: logging.info('Encoded %d of %d matrices', len(encoded), len(matrices))
+			encoded.append(self.encodeMatrix(mat, levelSet))
+		return encoded
 	
 	def isZero(self, u):
 		"""Test if u is a valid encoding of 0 at the highest level"""
@@ -135,10 +203,8 @@ class JigsawPuzzle(object):
 		v = self.R_q(u*self.pzt)
 		
 		#test if v is small enough -> has canonical embedding of Euclidean Norm smaller than q^(7/8)
-		norm = float(sum([int(a)**2 for a in v.list()]))**(0.5)
-		
-		ret = norm < (self.q**(7/8.0))
-		logging.info('Zero test result: %f < %f => %s'%(norm, self.q**(7/8.0), ret))
+		ret = passesZeroTest(v, self.zeroTestBound)
+		logging.info('Zero test result: norm < q^(7/8) => %s', ret)
 		return ret
 		
 	def getP(self):
@@ -150,20 +216,18 @@ class JigsawPuzzle(object):
 		"""Debug Helper: Calculate the norm of one element"""
 		
 		v = self.R_q(u*self.pzt)
-		norm = float(sum([int(a)**2 for a in v.list()]))**(0.5)
-		return norm
+		return _euclideanNorm(v)
 		
 	def __getZList(self):
 		"""Return self.k random polynomials over self.R_q which are all invertible"""
 		
 		ret = []
+		modulus = self.R_q.modulus()
 		while not(len(ret)==self.k):
 			new = self.R_q.random_element()
-			try:
-				tmp = 1/new
+			#invertible iff coprime to X^m+1 (q is prime), cheaper than computing the inverse
+			if new.lift().gcd(modulus) == 1:
 				ret.append(new)
-			except:
-				pass
 		return ret
 
 	def __chooseG(self):
@@ -181,8 +245,8 @@ class JigsawPuzzle(object):
 		
 		while not(cond):
 			#all coefficients smaller than 2^O(m^delta)
-			coeffs = [ZZ.random_element(0, bound) for i in range(self.m)]
-			g = sum([a*self.t**i for a, i in zip(coeffs, range(len(coeffs)))])
+			coeffs = _randomCoefficients(0, bound, self.m)
+			g = self.__polynomial(coeffs)
 
 			#conditions:
 			#|R/(g)| is large prime p (p > 2^lambda/securityParameter)
@@ -201,10 +265,15 @@ class JigsawPuzzle(object):
 		"""Generate the zero test parameter"""
 		
 		#random 'mid-size' polynimial, chosen from a discrete Gaussian in R, coefficients are of size roughly q^(2/3)
-		coeffs = [ZZ.random_element(int(0.9*self.q**(2/3.0)), int(1.1*self.q**(2/3.0))) for i in range(self.m)]
-		h = sum([a*self.t**i for a, i in zip(coeffs, range(len(coeffs)))])
+		coeffs = _randomCoefficients(int(0.9*self.q**(2/3.0)), int(1.1*self.q**(2/3.0)), self.m)
+		h = self.__polynomial(coeffs)
 		#pzt = h*product of all z_i / g
-		return h*reduce(mul, self.zList)/self.g
+		return h*self.zProduct/self.g
+	
+	def __polynomial(self, coeffs):
+		"""Return sum(coeffs[i]*t^i) as element of R, built directly from the coefficient list"""
+		
+		return self.R(self.R.cover_ring()(coeffs))
 	
 	def __getM(self, dim):
 		"""Chooses m according to dim.
@@ -235,11 +304,11 @@ if __name__ == '__main__':
 	puzzle = JigsawPuzzle(length+2, 2, dimensionality=2**3, delta=0.4, epsilon=0.5)
 	ring = Integers(puzzle.getP())
 	
-	print puzzle
-	print 'q^(7/8): %f' % (puzzle.q**(7/8.0))
+	print(puzzle)
+	print('q^(7/8): %f' % (puzzle.q**(7/8.0)))
 	
 	zeroEnc = puzzle.encode(ring(0), range(length+2))
 	
-	print 'encryption of zero: %s'%zeroEnc
+	print('encryption of zero: %s'%zeroEnc)
 
-	print 'is zero? %s'%puzzle.isZero(zeroEnc)
\ No newline at end of file
+	print('is zero? %s'%puzzle.isZero(zeroEnc))
\ No newline at end of file
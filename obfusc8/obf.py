@@ -29,25 +29,17 @@ Foundations of Computer Science (FOCS), 2013 IEEE 54th Annual Symposium on.
 IEEE. 2013, pp. 40-49.
 """
 
-from copy import deepcopy
+from copy import copy
 from operator import mul
-from numpy import dot
-from itertools import groupby, izip
+from itertools import izip
+from weakref import WeakKeyDictionary
 import logging
+import numpy
 
 from obfusc8.blocks import UniversalCircuit
-from obfusc8.bp import BranchingProgram
+from obfusc8.bp import BranchingProgram, composeIds
 from obfusc8.rbp import RandomizedBranchingProgram
-from obfusc8.mjp import JigsawPuzzle
-
-counter = 0
-def echo(arg):
-	"""Simple function to keep track of progress when applying the MJP"""
-	
-	global counter
-	if counter%20 == 0: print counter
-	counter += 1
-	return arg
+from obfusc8.mjp import JigsawPuzzle, passesZeroTest
 
 class IndistinguishabilityObfuscationGenerator(object):
 	"""Complete Indistinguishability Obfuscator as described in the paper
@@ -147,10 +139,13 @@ class IndistinguishabilityObfuscation(object):
 		self.inputLength = inputLength
 		
 		#copy important attributes
-		self.indexList = deepcopy(rbp.indexList)
-		self.R_q = deepcopy(mjp.R_q)
-		self.pzt = deepcopy(mjp.pzt)
-		self.q = deepcopy(mjp.q)
+		self.indexList = list(rbp.indexList)
+		self._indices = numpy.asarray(self.indexList, dtype=numpy.intp)
+		#Sage rings and their elements are immutable, references suffice
+		self.R_q = mjp.R_q
+		self.pzt = mjp.pzt
+		self.q = mjp.q
+		self.zeroTestBound = mjp.zeroTestBound
 		
 		self._applyMJP(rbp, mjp)
 		
@@ -162,11 +157,13 @@ class IndistinguishabilityObfuscation(object):
 		assert(len(inputs) == self.inputLength)
 		assert(all(bit in (0,1) for bit in inputs))
 		
-		matricesOP = [(in1 if inputs[index] else in0) for in0, in1, index in izip(self.D_0, self.D_1, self.indexList)]
-		resultOP =  reduce(mul, matricesOP, self.s) * self.t
-
-		matricesDP = [(in1 if inputs[index] else in0) for in0, in1, index in izip(self.DP_0, self.DP_1, self.indexList)]
-		resultDP = reduce(mul, matricesDP, self.sP) * self.tP
+		#select the matrices of all steps at once by indexing the (2, n) tables
+		n = len(self.indexList)
+		bits = numpy.asarray(inputs, dtype=numpy.intp)[self._indices]
+		positions = numpy.arange(n)
+		
+		resultOP =  reduce(mul, self._ins[bits, positions], self.s) * self.t
+		resultDP = reduce(mul, self._insP[bits, positions], self.sP) * self.tP
 		
 		res = resultOP[0] - resultDP[0]
 
@@ -181,48 +178,80 @@ class IndistinguishabilityObfuscation(object):
 		v = self.R_q(u*self.pzt)
 		
 		#test if v is small enough -> has canonical embedding of Euclidean Norm smaller than q^(7/8)
-		norm = float(sum([int(a)**2 for a in v.list()]))**(0.5)
-		
-		ret = norm < (self.q**(7/8.0))
-		logging.info('Zero test result: %f < %f => %s'%(norm, self.q**(7/8.0), ret))
+		ret = passesZeroTest(v, self.zeroTestBound)
+		logging.info('Zero test result: norm < q^(7/8) => %s', ret)
 		return ret
 	
 	def _applyMJP(self, rndBP, mjp):
 		"""Encode each element of the initial RBP using the functions
-		supplied by the MJP. Since this process is very slow, use the
-		echo function to keep track of the progress.
+		supplied by the MJP. Since this process is very slow, the MJP
+		logs the progress.
 		"""
 	
 		n = rndBP.length
+		#instruction i is encoded at level i+1, 0 and n+1 are used by s and t
+		levelSets = [[level+1] for level in xrange(n)]
 		self.s = rndBP.s.apply_map(lambda z: mjp.encode(z, [0]))
 		logging.info('s finished')
 		self.t = rndBP.t.apply_map(lambda z: mjp.encode(z, [n+1]))
 		logging.info('t finished')
-		self.D_0 = [echo(mjp.encodeMatrix(ins, [level+1])) for ins, level in izip(rndBP.D_0, xrange(n))]
-		self.D_1 = [echo(mjp.encodeMatrix(ins, [level+1])) for ins, level in izip(rndBP.D_1, xrange(n))]
+		self.D_0 = mjp.encodeMatrices(rndBP.D_0, levelSets)
+		self.D_1 = mjp.encodeMatrices(rndBP.D_1, levelSets)
 		logging.info('originalProgram finished')
 		
 		self.sP = rndBP.sP.apply_map(lambda z: mjp.encode(z, [0]))
 		logging.info('sP finished')
 		self.tP = rndBP.tP.apply_map(lambda z: mjp.encode(z, [n+1]))
 		logging.info('tP finished')
-		self.DP_0 = [echo(mjp.encodeMatrix(ins, [level+1])) for ins, level in izip(rndBP.DP_0, xrange(n))]
-		self.DP_1 = [echo(mjp.encodeMatrix(ins, [level+1])) for ins, level in izip(rndBP.DP_1, xrange(n))]
+		self.DP_0 = mjp.encodeMatrices(rndBP.DP_0, levelSets)
+		self.DP_1 = mjp.encodeMatrices(rndBP.DP_1, levelSets)
 		logging.info('dummyProgram finished')
+		
+		self._ins = _selectionTable(self.D_0, self.D_1)
+		self._insP = _selectionTable(self.DP_0, self.DP_1)
 	
 	def __str__(self):
 		return 'Obfuscation of circuit with input length %d' % self.inputLength
 
+def _selectionTable(ins0, ins1):
+	"""Return a (2, n) object array holding ins0 and ins1, so that
+	table[bits, arange(n)] selects the matrices for the input bits
+	"""
+	
+	table = numpy.empty((2, len(ins0)), dtype=object)
+	#assign one by one, numpy would otherwise try to unpack the matrices
+	for i, (in0, in1) in enumerate(izip(ins0, ins1)):
+		table[0, i] = in0
+		table[1, i] = in1
+	return table
+
+#control inputs of circuits that were already fixed against, see _obtainCtrlInput
+_ctrlInputs = WeakKeyDictionary()
+
+def _obtainCtrlInput(circuit):
+	"""Return UniversalCircuit.obtainCtrlInput(circuit), computed once per circuit
+	
+	The result is reused as long as the cached gate dictionary of the
+	circuit is the same object, mergeDuplicates replaces it.
+	"""
+	
+	gates = circuit.getDict()
+	if circuit not in _ctrlInputs or _ctrlInputs[circuit][0] is not gates:
+		_ctrlInputs[circuit] = (gates, UniversalCircuit.obtainCtrlInput(circuit))
+	return _ctrlInputs[circuit][1]
+
 def fixBP(bp, circuit):
 	"""Fix a UBP using the binary description of a circuit."""
 	
 	logging.info('Starting BP fixing')
-	ctrlInput = UniversalCircuit.obtainCtrlInput(circuit)
-	logging.info('circuit control input: %s'%ctrlInput)
+	ctrlInput = _obtainCtrlInput(circuit)
+	logging.info('circuit control input: %s', ctrlInput)
 	assert(len(circuit.inputs)+len(ctrlInput) > max(bp.indexList))
 	
-	newIns0, newIns1, newIndex = fixInstructions(bp.ins0, bp.ins1, bp.indexList, ctrlInput, dot)
-	newBP = BranchingProgram(newIns0, newIns1, newIndex, bp.zeroPerm, bp.onePerm)
+	#fix on the permutation ids, composing two of them is a lookup in the Cayley table
+	ids0, ids1 = bp.ids
+	newIds0, newIds1, newIndex = fixInstructions(ids0, ids1, bp.indexList, ctrlInput, composeIds)
+	newBP = BranchingProgram.fromIds(newIds0, newIds1, newIndex, bp.zeroPerm, bp.onePerm)
 	logging.info('new BP: %s'%newBP)
 	logging.info('BP fixed successfully')
 	
@@ -232,15 +261,17 @@ def fixRBP(rbp, circuit):
 	"""Fix a URBP using the binary description of a circuit."""
 	
 	logging.info('Starting RBP fixing')
-	ctrlInput = UniversalCircuit.obtainCtrlInput(circuit)
-	logging.info('circuit control input: %s'%ctrlInput)
+	ctrlInput = _obtainCtrlInput(circuit)
+	logging.info('circuit control input: %s', ctrlInput)
 	assert(len(circuit.inputs)+len(ctrlInput) > max(rbp.indexList))
 	
-	newRBP = deepcopy(rbp)
+	#shallow copy, all instruction related attributes are replaced below
+	newRBP = copy(rbp)
 	newRBP.D_0, newRBP.D_1, newIndex = fixInstructions(rbp.D_0, rbp.D_1, rbp.indexList, ctrlInput, mul)
 	newRBP.DP_0, newRBP.DP_1, _ = fixInstructions(rbp.DP_0, rbp.DP_1, rbp.indexList, ctrlInput, mul)
 	newRBP.indexList = newIndex
 	newRBP.length = len(newIndex)
+	newRBP._arrays = None
 	logging.info('new RBP: %s'%newRBP)
 	logging.info('RBP fixed successfully')
 	
@@ -259,38 +290,37 @@ def fixInstructions(ins0, ins1, indexList, ctrlInput, multiply):
 
 	fixingLength = len(ctrlInput)
 	
-	#get list of lists each lists only contains instructions that either can be fixed or not, order remains the same
-	splitted = groupby(izip(indexList, ins0, ins1), lambda x: x[0] < fixingLength)
-	
-	#check if first group can be fixed and load second one as well if that's the case
-	k, group = splitted.next()	
-	if k:
-		fixed = [(in1 if ctrlInput[index] else in0) for index, in0, in1 in group]
-		fixed = reduce(multiply, fixed)
-		_, group = splitted.next()
-	_, newIns0, newIns1 = map(list, zip(*group))
-	if k: 
-		newIns0[0] = multiply(fixed, newIns0[0])
-		newIns1[0] = multiply(fixed, newIns1[0])
-	
-	#load all other groups and fix + apply as possible
-	for k, group in splitted:
+	#boundaries of the runs of instructions that either can be fixed or not, order remains the same
+	indices = numpy.asarray(indexList, dtype=numpy.intp)
+	fixable = indices < fixingLength
+	boundaries = numpy.concatenate(([0], numpy.flatnonzero(numpy.diff(fixable)) + 1, [len(indices)])).tolist()
+	#control input bit of every fixable instruction, gathered at once
+	selection = numpy.zeros(len(indices), dtype=bool)
+	selection[fixable] = numpy.asarray(ctrlInput, dtype=bool)[indices[fixable]]
+	
+	newIns0, newIns1 = [], []
+	leading = None
+	for start, end in izip(boundaries[:-1], boundaries[1:]):
 		#can be fixed -> reduce to one matrix and apply to both matrices in instruction to the left
-		if k:
-			fixed = [(in1 if ctrlInput[index] else in0) for index, in0, in1 in group]
-			fixed = reduce(multiply, fixed)
-			newIns0[-1] = multiply(newIns0[-1], fixed)
-			newIns1[-1] = multiply(newIns1[-1], fixed)
+		if fixable[start]:
+			fixed = reduce(multiply, [(ins1[i] if bit else ins0[i]) for i, bit in izip(xrange(start, end), selection[start:end].tolist())])
+			if newIns0:
+				newIns0[-1] = multiply(newIns0[-1], fixed)
+				newIns1[-1] = multiply(newIns1[-1], fixed)
+			else:
+				leading = fixed
 		#no fixing -> only append
 		else:
-			_, add0, add1 = zip(*group)
-			newIns0 += add0
-			newIns1 += add1
+			newIns0.extend(ins0[start:end])
+			newIns1.extend(ins1[start:end])
+	
+	#the first run is fixed -> apply to both matrices in the first remaining instruction
+	if leading is not None:
+		newIns0[0] = multiply(leading, newIns0[0])
+		newIns1[0] = multiply(leading, newIns1[0])
 	
-	#remove all indices that where already fixed
-	newIndex = filter(lambda x: x >= fixingLength, indexList)
-	#correct the index position
-	newIndex = [ind-fixingLength for ind in newIndex]
+	#remove all indices that where already fixed and correct the index position
+	newIndex = (indices[~fixable] - fixingLength).tolist()
 	
 	assert(len(newIndex)==len(newIns0))
 	
@@ -318,7 +348,7 @@ if __name__ == '__main__':
 	fixedBP = fixBP(bp, circuit)
 	print 'After fixing: %s'%fixedBP
 
-	for test in list(product([0,1], repeat=inputLength)):
+	for test in product([0,1], repeat=inputLength):
 		test = list(test)
 		circuitResult = circuit.evaluate(test)
 		bpResult = fixedBP.evaluate(test)
@@ -8,8 +8,9 @@ order to facilitate the generation.
 
 from sage.all import *
 from operator import mul
-from itertools import izip, imap
+from itertools import count, izip, imap
 import logging
+import numpy
 
 from obfusc8.bp import BranchingProgram
 
@@ -45,11 +46,15 @@ class RandomizedBranchingProgram(object):
 
 		#----------- generate D, D' -------------------
 		
-		#some speed trickery, this method was fastest in during testing
+		#the sparse matrices are built directly from their nonzero entries, like diagonal_matrix does
+		size = 2 * m + 5
+		diagonal = [(i, i) for i in range(2 * m)]
+		
 		def genDMatrix(ins, alpha): 
-			ret = diagonal_matrix(ring, _randomElements(ring, 2 * m)+[0]*5)
-			ret[-5:,-5:] = alpha*matrix(ins)
-			return ret
+			entries = dict(izip(diagonal, _randomResidues(ring, 2 * m).tolist()))
+			#alpha times the permutation matrix of ins in the lower right corner
+			entries.update(((2 * m + i, 2 * m + j), alpha) for i, j in enumerate(ins.tolist()))
+			return matrix(ring, size, size, entries, sparse=True)
 		
 		#D_0 is a list of all D_i0
 		logging.info('Generating D_0')
@@ -59,9 +64,11 @@ class RandomizedBranchingProgram(object):
 		logging.info('Generating D_1')
 		D_1 = imap(genDMatrix, branchingProgram.ins1, a1)
 		
-		#again trying to speed things up
 		def genDPMatrix(alpha):
-			return diagonal_matrix(ring, _randomElements(ring, 2 * m)+[alpha]*5)
+			entries = dict(izip(diagonal, _randomResidues(ring, 2 * m).tolist()))
+			#alpha times the identity in the lower right corner
+			entries.update(((i, i), alpha) for i in range(2 * m, size))
+			return matrix(ring, size, size, entries, sparse=True)
 		
 		#same for D' with Identity + a0/1p
 		logging.info('Generating DP_0')
@@ -106,7 +113,10 @@ class RandomizedBranchingProgram(object):
 		self.sP = sP * R0Inv
 		self.DP_0, self.DP_1 = map(list, zip(*imap(mul3, DP_0, DP_1)))
 		Rn, _ = rGen.next()
-		self.tP = Rn * tP	
+		self.tP = Rn * tP
+		
+		#numpy copy of the program for evaluate, built on first use
+		self._arrays = None
 		
 	@classmethod
 	def fromCircuit(cls, circuit, p, rndMatSize=None):
@@ -118,21 +128,66 @@ class RandomizedBranchingProgram(object):
 		"""Evaluate the RBP for list of input values"""
 		
 		logging.info('Evaluating rbp with inputs: %s', str(inputs))
-		assert(len(inputs) >= max(self.indexList))
-		assert(all(bit in (0,1) for bit in inputs))
+		inputBits = numpy.asarray(inputs, dtype=numpy.intp)
+		assert(((inputBits == 0) | (inputBits == 1)).all())
 		
-		matricesOP = ((in1 if inputs[index] else in0) for in0, in1, index in izip(self.D_0, self.D_1, self.indexList))
-		resultOP =  reduce(mul, matricesOP, self.s) * self.t
+		arrays = self._getArrays()
+		if arrays is not None:
+			#chain of int64 vector-matrix products mod p, no Sage dispatch per step
+			indices, s, programs, t = arrays
+			assert(len(inputs) >= indices.max())
+			#select the matrices of all steps at once by indexing the (2, n, 2, size, size) stack
+			bits = inputBits[indices]
+			positions = numpy.arange(self.length)
+			p = int(self.p)
+			#original and dummy program are evaluated side by side
+			resultOP, resultDP = _modularChain(s, programs[bits, positions], t, p)
+			difference = (resultOP - resultDP) % p
+		else:
+			assert(len(inputs) >= max(self.indexList))
+			bits = inputBits[self.indexList].tolist()
+			
+			matricesOP = [(in1 if bit else in0) for in0, in1, bit in izip(self.D_0, self.D_1, bits)]
+			resultOP =  reduce(mul, matricesOP, self.s) * self.t
 
-		matricesDP = ((in1 if inputs[index] else in0) for in0, in1, index in izip(self.DP_0, self.DP_1, self.indexList))
-		resultDP = reduce(mul, matricesDP, self.sP) * self.tP
+			matricesDP = [(in1 if bit else in0) for in0, in1, bit in izip(self.DP_0, self.DP_1, bits)]
+			resultDP = reduce(mul, matricesDP, self.sP) * self.tP
+			difference = resultOP[0] - resultDP[0]
 		
 		#Result of Original Program - Result of Dummy Program should be 0
-		if (resultOP[0] - resultDP[0]) == 0: ret = 1
+		if difference == 0: ret = 1
 		else: ret = 0
 		logging.info('rbp evaluation result: %d', ret)
 		return ret
 	
+	def _getArrays(self):
+		"""Return the index list as intp array and s, programs, t as numpy
+		arrays of residues, built on first use. s and t hold the vectors of
+		the original and the dummy program as shape (2, size). programs
+		stacks the instructions as shape (2, length, 2, size, size), indexed
+		by bit, step and program (original, dummy).
+		
+		The instructions use the smallest unsigned type that holds all
+		residues, to cut down the memory traffic of the evaluation. The
+		vectors are int64, so all products are accumulated in int64.
+		
+		Returns None if the entries of one vector-matrix product could
+		overflow int64, evaluate then falls back to the Sage matrices.
+		Reset self._arrays to None after changing the program.
+		"""
+		
+		size = 2*self.m+5
+		if size*(self.p-1)**2 >= 2**63: return None
+		
+		if getattr(self, '_arrays', None) is None:
+			dtype = numpy.uint16 if self.p <= 2**16 else (numpy.uint32 if self.p <= 2**32 else numpy.int64)
+			toVectors = lambda vecOP, vecDP: numpy.array([map(int, vecOP.list()), map(int, vecDP.list())], dtype=numpy.int64)
+			instructions = ((self.D_0, self.DP_0), (self.D_1, self.DP_1))
+			programs = numpy.array([[[map(int, matOP.list()), map(int, matDP.list())] for matOP, matDP in izip(insOP, insDP)] 
+				for insOP, insDP in instructions], dtype=dtype).reshape(2, -1, 2, size, size)
+			self._arrays = (numpy.asarray(self.indexList, dtype=numpy.intp), toVectors(self.s, self.sP), programs, toVectors(self.t, self.tP))
+		return self._arrays
+	
 	def __getM(self, size):
 		"""Choose m according to size.
 		
@@ -153,6 +208,19 @@ class RandomizedBranchingProgram(object):
 	def __str__(self):
 		return 'Randomized Branching Program of length %d over ring modulo %d' % (self.length, self.p)
 
+def _modularChain(s, matrices, t, p):
+	"""Return s[k] * product of matrices[:, k] * t[k] mod p for all programs k
+	
+	s and t are int64 arrays of shape (programs, size), matrices has shape
+	(length, programs, size, size), so that each step multiplies all
+	programs with one matmul call.
+	"""
+	
+	v = s[:, None, :]
+	for mats in matrices:
+		v = numpy.matmul(v, mats) % p
+	return ((v[:, 0] * t).sum(axis=1) % p).tolist()
+
 def _generateRs(ring, m):
 	"""Return a tuple with two (semi)random matrices of size 2*m+5 
 	over the ring. The first matrix is the inverse of the second matrix 
@@ -167,11 +235,12 @@ def _generateRs(ring, m):
 		old = random_matrix(ring, 2 * m + 5)
 	
 	while True:
-		new = random_matrix(ring, 2 * m + 5)
-		while not new.is_invertible():
+		#invert right away instead of checking invertibility first, a singular matrix is simply redrawn
+		try:
 			new = random_matrix(ring, 2 * m + 5)
-		newInv = new.inverse()
-		#print 'yield'
+			newInv = new.inverse()
+		except ZeroDivisionError:
+			continue
 		yield (old, newInv)
 		old = new
 
@@ -185,19 +254,18 @@ def _generateAlphas(n, indexList, ring):
 	alphas = _randomElements(ring, n)
 	alphasP = _randomElements(ring, n)
 	
-	for i in range(max(indexList)+1):
-		alphasForIndex = [alpha for alpha, index in zip(alphas, indexList) if index == i]
-		targetValue = reduce(mul, alphasForIndex, ring(1))
-		
-		alphasPForIndex = [alpha for alpha, index in zip(alphasP, indexList) if index == i]
-		primeValue = reduce(mul, alphasPForIndex, ring(1))
-		
-		#change the first value of the first alphaP belonging to the current index so that the products will be identical
-		try:
-			firstIndex = indexList.index(i)
-			alphasP[firstIndex] = (targetValue*alphasP[firstIndex]) / primeValue
-		except ValueError:
-			pass
+	#products of the alphas looking at the same index and first position of each index, in one pass
+	targetValues = {}
+	primeValues = {}
+	firstIndices = {}
+	for position, alpha, alphaP, index in izip(count(), alphas, alphasP, indexList):
+		targetValues[index] = targetValues.get(index, ring(1))*alpha
+		primeValues[index] = primeValues.get(index, ring(1))*alphaP
+		firstIndices.setdefault(index, position)
+	
+	#change the first alphaP belonging to each index so that the products will be identical
+	for index, firstIndex in firstIndices.iteritems():
+		alphasP[firstIndex] = (targetValues[index]*alphasP[firstIndex]) / primeValues[index]
 	
 	return (alphas, alphasP)
 
@@ -221,13 +289,22 @@ def _randomElements(ring, n):
 	"""Return a list of length n with random elements (except 0) from ring"""
 	
 	assert(n>=0)
-	ret = []
+	return map(ring, _randomResidues(ring, n).tolist())
+
+def _randomResidues(ring, shape):
+	"""Return an array of the given shape with random integers from [1, order of ring)
+	
+	The integers are drawn with one numpy call as long as they fit into
+	int64, otherwise they are Python integers in an object array.
+	"""
 	
-	while(len(ret)<n):
-		new = ring.random_element()
-		if new != ring(0): ret.append(new)
+	p = int(ring.order())
+	if p <= 2**63:
+		return numpy.random.randint(1, p, size=shape, dtype=numpy.int64)
 	
-	return ret
+	residues = numpy.empty(shape, dtype=object)
+	residues.flat = [int(ZZ.random_element(1, p)) for _ in range(residues.size)]
+	return residues
 
 if __name__ == '__main__':
 	
@@ -247,7 +324,7 @@ if __name__ == '__main__':
 	rbp = RandomizedBranchingProgram.fromCircuit(crc, 1049)
 	print rbp
 	
-	for test in list(product([0,1], repeat=inputLength)):
+	for test in product([0,1], repeat=inputLength):
 		test = list(test)
 		bpResult = bp.evaluate(test)
 		rbpResult = rbp.evaluate(test)
@@ -14,14 +14,14 @@ class TestSimBlock(unittest.TestCase):
 		self.circuit = Circuit(self.circuit, self.control)
 
 	def test_notGate_simulation(self):
-		for test in list(product([0,1], repeat=self.inputLength)):
+		for test in product([0,1], repeat=self.inputLength):
 			test = list(test)
 			correct = not test[0]
 			result = self.circuit.evaluate([0]+test)
 			self.assertEqual(correct, result, 'Wrong evaluation on input %s. Was %s instead of %s'%(test, result, correct))
 
 	def test_andGate_simulation(self):
-		for test in list(product([0,1], repeat=self.inputLength)):
+		for test in product([0,1], repeat=self.inputLength):
 			test = list(test)
 			correct = test[0] and test[1]
 			result = self.circuit.evaluate([1]+test)
@@ -38,14 +38,14 @@ class TestYBlock(unittest.TestCase):
 		self.circuit = Circuit(self.circuit, self.control)
 
 	def test_left_switch(self):
-		for test in list(product([0,1], repeat=self.inputLength)):
+		for test in product([0,1], repeat=self.inputLength):
 			test = list(test)
 			correct = test[0]
 			result = self.circuit.evaluate([0]+test)
 			self.assertEqual(correct, result, 'Wrong evaluation on input %s. Was %s instead of %s'%(test, result, correct))
 
 	def test_right_switch(self):
-		for test in list(product([0,1], repeat=self.inputLength)):
+		for test in product([0,1], repeat=self.inputLength):
 			test = list(test)
 			correct = test[1]
 			result =  self.circuit.evaluate([1]+test)
@@ -64,7 +64,7 @@ class TestSU1(unittest.TestCase):
 		for pos in range(self.inputLength):
 			ctrlValues = S_u_1.getControlValues(self.inputLength, pos)
 
-			for test in list(product([0,1], repeat=self.inputLength)):
+			for test in product([0,1], repeat=self.inputLength):
 				test = list(test)
 				correct = test[pos]
 				result = self.circuit.evaluate(ctrlValues+test)
@@ -81,8 +81,8 @@ class TestSUV(unittest.TestCase):
 
 	def setUp(self):
 		self.inputLength = 10
-		inputs = [Input('x') for _ in range(0, self.inputLength)]
-		suvBlock = S_u_v(self.inputLength, self.inputLength, inputs)
+		self.inputs = [Input('x') for _ in range(0, self.inputLength)]
+		suvBlock = S_u_v(self.inputLength, self.inputLength, self.inputs)
 		outputList, controls = suvBlock.extractCircuit()
 		#split controls into lists belonging to one output and consequently to one circuit
 		controls = [controls[x:x+self.inputLength-1] for x in xrange(0, self.inputLength**2-self.inputLength, self.inputLength-1)]
@@ -92,7 +92,7 @@ class TestSUV(unittest.TestCase):
 		#use S_u_1 to avoid having to split the control values again
 		ctrlValues = [S_u_1.getControlValues(self.inputLength, i) for i in range(self.inputLength)]
 		
-		for test in list(product([0,1], repeat=self.inputLength)):
+		for test in product([0,1], repeat=self.inputLength):
 			test = list(test)
 			#the ith switch should return the ith bit so the result should be equal to the input
 			correct = list(test)
@@ -103,15 +103,22 @@ class TestSUV(unittest.TestCase):
 		correct = list(chain(*[S_u_1.getControlValues(self.inputLength, n) for n in range(self.inputLength)]))
 		self.assertEqual(correct, S_u_v.getControlValues(self.inputLength, range(self.inputLength)), 'Incorrect control value list')
 
+	def test_inputs_negated_once(self):
+		gates = {}
+		for crc in self.circuitList: gates.update(crc.getDict())
+		negatedInputs = [gate.input1 for gate in gates.values() if gate.getType() == 0 and gate.input1 in self.inputs]
+		self.assertEqual(sorted(self.inputs), sorted(negatedInputs), 'inputs not negated exactly once')
+
 class TestUniversalCircuit(unittest.TestCase):
 
-	def setUp(self):
-		self.inputLength = 4
+	@classmethod
+	def setUpClass(cls):
+		cls.inputLength = 4
 		outputLength = 1
 		numberOfGates = 5
-		self.inputs = [Input('x') for _ in range(0, self.inputLength)]
+		cls.inputs = [Input('x') for _ in range(0, cls.inputLength)]
 		
-		self.uc = UniversalCircuit(self.inputLength, outputLength, numberOfGates)
+		cls.uc = UniversalCircuit(cls.inputLength, outputLength, numberOfGates)
 
 	def test_simulate_example_circuit_1(self):
 		# -(x0&(x1&(x2&-x3)))
@@ -120,7 +127,7 @@ class TestUniversalCircuit(unittest.TestCase):
 		simulandCtrlInput = UniversalCircuit.obtainCtrlInput(simuland)
 		
 		#assert that uc(sCtrlInput+Input) == simuland(Input) on all inputs
-		for test in list(product([0,1], repeat=self.inputLength)):
+		for test in product([0,1], repeat=self.inputLength):
 			test = list(test)
 			correct = simuland.evaluate(test)
 			result = self.uc.evaluate(simulandCtrlInput+test)
@@ -133,7 +140,7 @@ class TestUniversalCircuit(unittest.TestCase):
 		simulandCtrlInput = UniversalCircuit.obtainCtrlInput(simuland)
 		
 		#assert that uc(sCtrlInput+Input) == simuland(Input) on all inputs
-		for test in list(product([0,1], repeat=self.inputLength)):
+		for test in product([0,1], repeat=self.inputLength):
 			test = list(test)
 			correct = simuland.evaluate(test)
 			result = self.uc.evaluate(simulandCtrlInput+test)
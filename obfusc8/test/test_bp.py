@@ -1,64 +1,86 @@
 import unittest
 from itertools import product
+from numpy import array, arange, argmax, stack, dot, where, flatnonzero
 
 from obfusc8.circuit import *
 from obfusc8.bp import *
+from obfusc8.generate_bp_mappings import oldC2BP1, oldC2BP2, getPossiblePerms, calculateMappings
 
 #enable testing of 'private' module member functions, somewhat sloppy style but I prefer it to any alternative
-from obfusc8.bp import _matrix2cycle
+from obfusc8.bp import _perm2cycle, _perms2ids, _CAYLEY, _ID2PERM
 
 class TestBranchingProgram(unittest.TestCase):
 
-	def setUp(self):
-		self.inputLength = 8
-		inputs = [Input("x"+str(x)) for x in range(0, self.inputLength)]
+	@classmethod
+	def setUpClass(cls):
+		cls.inputLength = 8
+		inputs = [Input("x"+str(x)) for x in range(0, cls.inputLength)]
 		
 		# (-(x0 & x1) & (-x2 & x3)) & ((x4 & x5) & -(x6 & -x7))
-		self.circuit = Circuit(AndGate(AndGate(NotGate(AndGate(inputs[0], inputs[1])), AndGate(NotGate(inputs[2]), inputs[3])), AndGate(AndGate(inputs[4], inputs[5]),NotGate(AndGate(inputs[6], NotGate(inputs[7]))))))
+		cls.circuit = Circuit(AndGate(AndGate(NotGate(AndGate(inputs[0], inputs[1])), AndGate(NotGate(inputs[2]), inputs[3])), AndGate(AndGate(inputs[4], inputs[5]),NotGate(AndGate(inputs[6], NotGate(inputs[7]))))))
 		
-		self.bp = BranchingProgram.fromCircuit(self.circuit)
+		cls.bp = BranchingProgram.fromCircuit(cls.circuit)
 
 	def test_estimateBPSize_for_example_circuit(self):
 		self.assertEqual(self.bp.length, BranchingProgram.estimateBPSize(self.circuit), 'incorrecet size calculated')
 
 	def test_equality_of_bp_to_circuit(self):
-		for test in list(product([0,1], repeat=self.inputLength)):
-			test = list(test)
+		for test in product([0,1], repeat=self.inputLength):
 			circuitResult = self.circuit.evaluate(test)
 			bpResult = self.bp.evaluate(test)
 			self.assertEqual(circuitResult, bpResult, 'Wrong evaluation on input %s. Was %s instead of %s'%(test, circuitResult, bpResult))
 
+	def test_evaluateBatch_matches_truth_table(self):
+		tests = list(product([0,1], repeat=self.inputLength))
+		results = self.bp.evaluateBatch(tests)
+		self.assertEqual(results.tolist(), list(self.circuit.evaluateTruthTable()), 'batched evaluation differs from the truth table')
+		self.assertEqual(results[:3].tolist(), [self.bp.evaluate(test) for test in tests[:3]], 'batched evaluation differs from evaluate')
+
+	def test_fromIds_roundtrip(self):
+		ids0, ids1 = self.bp.ids
+		newBP = BranchingProgram.fromIds(ids0, ids1, self.bp.indexList, self.bp.zeroPerm, self.bp.onePerm)
+		self.assertTrue((self.bp.ins0 == newBP.ins0).all() and (self.bp.ins1 == newBP.ins1).all(), 'instructions changed by ids/fromIds')
+
+	def test_old_generators_match_fromCircuit(self):
+		for generator in (oldC2BP1, oldC2BP2):
+			oldBP = generator(self.circuit)
+			self.assertEqual(self.bp.length, oldBP.length, 'wrong length of BP from %s'%generator.__name__)
+			for test in product([0,1], repeat=self.inputLength):
+				self.assertEqual(self.bp.evaluate(test), oldBP.evaluate(test), 'Wrong evaluation of BP from %s on input %s'%(generator.__name__, test))
+		#the second version is what the mappings implement
+		oldBP = oldC2BP2(self.circuit)
+		self.assertTrue((self.bp.ins0 == oldBP.ins0).all() and (self.bp.ins1 == oldBP.ins1).all(), 'instructions differ from oldC2BP2')
+
 class TestPrecalculatedMappings(unittest.TestCase):
 
-	def setUp(self):
-		self.mappings = precalculatedMappings()
-		self.id2permList = precalculatedId2PermList()
+	@classmethod
+	def setUpClass(cls):
+		cls.mappings = precalculatedMappings()
+		cls.id2permList = precalculatedId2PermList()
 
 	def test_precalculated_mappings(self):
-		for id, perm in zip(range(len(self.id2permList)), self.id2permList):
-			correct = dot(dot(_ni2n(), dot(perm, _normalInv())), _ni2n())
-			mappedResult = self.id2permList[self.mappings[0][id]]
-			self.assertTrue((correct == mappedResult).all(), 'Mapping 0 not correct on input %s. Was %s instead of %s.'%(perm, mappedResult, correct))
-			
-			correct = dot(dot(_ni2n(), perm), _ni2n())
-			mappedResult = self.id2permList[self.mappings[1][id]]
-			self.assertTrue((correct == mappedResult).all(), 'Mapping 0 not correct on input %s. Was %s instead of %s.'%(perm, mappedResult, correct))
-			
-			correct = dot(dot(_sec2si(), perm), _sec2si())
-			mappedResult = self.id2permList[self.mappings[2][id]]
-			self.assertTrue((correct == mappedResult).all(), 'Mapping 0 not correct on input %s. Was %s instead of %s.'%(perm, mappedResult, correct))
-			
-			correct = dot(dot(_special1(), perm), _special1())
-			mappedResult = self.id2permList[self.mappings[3][id]]
-			self.assertTrue((correct == mappedResult).all(), 'Mapping 0 not correct on input %s. Was %s instead of %s.'%(perm, mappedResult, correct))
-			
-			correct = dot(dot(_special2(), perm), _special3())
-			mappedResult = self.id2permList[self.mappings[4][id]]
-			self.assertTrue((correct == mappedResult).all(), 'Mapping 0 not correct on input %s. Was %s instead of %s.'%(perm, mappedResult, correct))
-			
-			correct = dot(dot(_n2secInv(), perm), _n2sec())
-			mappedResult = self.id2permList[self.mappings[5][id]]
-			self.assertTrue((correct == mappedResult).all(), 'Mapping 0 not correct on input %s. Was %s instead of %s.'%(perm, mappedResult, correct))
+		#mapping k maps perm to left*perm*right, composed as ids via the Cayley table for all permutations at once
+		left = _matrices2ids([_ni2n(), _ni2n(), _sec2si(), _special1(), _special2(), _n2secInv()])
+		right = _matrices2ids([dot(_normalInv(), _ni2n()), _ni2n(), _sec2si(), _special1(), _special3(), _n2sec()])
+		permIds = arange(len(self.id2permList))
+		
+		for k in range(len(left)):
+			correct = _CAYLEY[_CAYLEY[left[k], permIds], right[k]]
+			wrong = flatnonzero(correct != self.mappings[k])
+			self.assertEqual(len(wrong), 0, 'Mapping %d not correct on inputs %s.'%(k, [self.id2permList[id] for id in wrong]))
+
+	def test_precalculated_tables_match_generator(self):
+		permIds, id2perm = getPossiblePerms()
+		self.assertEqual([perm.tolist() for perm in id2perm], [perm.tolist() for perm in self.id2permList], 'shipped id2permList differs from generated one')
+		self.assertEqual(calculateMappings(permIds, id2perm).tolist(), self.mappings, 'shipped mappings differ from generated ones')
+
+	def test_cayley_table(self):
+		for a, first in enumerate(self.id2permList):
+			for b, second in enumerate(self.id2permList):
+				correct = composePerms(first, second)
+				result = _ID2PERM[_CAYLEY[a, b]]
+				self.assertEqual(composeIds(a, b), _CAYLEY[a, b], 'composeIds differs from the Cayley table for ids %d, %d'%(a, b))
+				self.assertTrue((correct == result).all(), 'Cayley table wrong for ids %d, %d. Was %s instead of %s.'%(a, b, result, correct))
 
 def _identity(): return array([[1,0,0,0,0],[0,1,0,0,0],[0,0,1,0,0],[0,0,0,1,0],[0,0,0,0,1]])
 def _normal(): return array([[0,1,0,0,0],[0,0,1,0,0],[0,0,0,1,0],[0,0,0,0,1],[1,0,0,0,0]]) 	#(01234)
@@ -72,21 +94,30 @@ def _special1(): return array([[1, 0, 0, 0, 0],[0, 0, 0, 1, 0],[0, 0, 0, 0, 1],[
 def _special2(): return array([[1, 0, 0, 0, 0],[0, 1, 0, 0, 0],[0, 0, 0, 0, 1],[0, 0, 1, 0, 0],[0, 0, 0, 1, 0]]) #(243)
 def _special3(): return array([[1, 0, 0, 0, 0],[0, 1, 0, 0, 0],[0, 0, 0, 1, 0],[0, 0, 0, 0, 1],[0, 0, 1, 0, 0]]) #(234)
 
+def _matrix2perm(permMatrix): return where(permMatrix==1)[1]
+def _matrices2ids(permMatrices): return _perms2ids([_matrix2perm(permMatrix) for permMatrix in permMatrices])
+
 class TestExplicitPermutations(unittest.TestCase):
 
-	def test_matrix2cycle(self):
+	def test_perm2cycle(self):
 		a = array([[0,0,1,0,0],[0,1,0,0,0],[1,0,0,0,0],[0,0,0,1,0],[0,0,0,0,1]])
-		self.assertEqual(_matrix2cycle(a), '(02)', 'wrong on input %s'%a)
-		self.assertEqual('(01234)', _matrix2cycle(_normal()), 'wrong on input %s'%_normal())
-		self.assertEqual('e', _matrix2cycle(_identity()), 'wrong on input %s'%_identity())
-		self.assertEqual('(04321)', _matrix2cycle(_normalInv()), 'wrong on input %s'%_normalInv())
-		self.assertEqual('(14)(23)', _matrix2cycle(_ni2n()), 'wrong on input %s'%_ni2n())
-		self.assertEqual('(124)', _matrix2cycle(_n2sec()), 'wrong on input %s'%_n2sec())
-		self.assertEqual('(142)', _matrix2cycle(_n2secInv()), 'wrong on input %s'%_n2secInv())
-		self.assertEqual('(12)(34)', _matrix2cycle(_sec2si()), 'wrong on input %s'%_sec2si())
-		self.assertEqual('(13)(24)', _matrix2cycle(_special1()), 'wrong on input %s'%_special1())
-		self.assertEqual('(243)', _matrix2cycle(_special2()), 'wrong on input %s'%_special2())
-		self.assertEqual('(234)', _matrix2cycle(_special3()), 'wrong on input %s'%_special3())
+		matrices = [a, _normal(), _identity(), _normalInv(), _ni2n(), _n2sec(), _n2secInv(), _sec2si(), _special1(), _special2(), _special3()]
+		correct = ['(02)', '(01234)', 'e', '(04321)', '(14)(23)', '(124)', '(142)', '(12)(34)', '(13)(24)', '(243)', '(234)']
+		#permutation vectors of all matrices in one call
+		perms = argmax(stack(matrices), axis=2).tolist()
+		self.assertEqual(map(_perm2cycle, perms), correct, 'wrong cycle notation for %s'%perms)
+
+	def test_perm2matrix_roundtrip(self):
+		for perm in precalculatedId2PermList():
+			self.assertTrue((_matrix2perm(perm2matrix(perm)) == perm).all(), 'wrong on input %s'%perm)
+
+	def test_composePerms_matches_matrix_product(self):
+		id2permList = precalculatedId2PermList()
+		for first in id2permList:
+			for second in id2permList:
+				correct = dot(perm2matrix(first), perm2matrix(second))
+				result = perm2matrix(composePerms(first, second))
+				self.assertTrue((correct == result).all(), 'wrong on input %s, %s'%(first, second))
 
 if __name__ == '__main__':
 	unittest.main()
@@ -36,11 +36,35 @@ class TestCircuit(unittest.TestCase):
 		self.assertEqual(self.circuit.countGates(), self.circuit.countGates(0)+self.circuit.countGates(1), 'complete gate count unequal to not + and Gates')
 
 	def test_evaluate(self):
-		for test in list(product([0,1], repeat=self.inputLength)):
-			test = list(test)
+		for test in product([0,1], repeat=self.inputLength):
 			correct = (not (test[0] and test[1]) and (not test[2] and test[3]))
 			self.assertEqual(correct, self.circuit.evaluate(test), 'Wrong evaluation on input %s. Was %s instead of %s'%(test, self.circuit.evaluate(test), correct))
 
+	def test_evaluateTruthTable(self):
+		table = self.circuit.evaluateTruthTable()
+		self.assertEqual(2**self.inputLength, len(table), 'wrong truth table length')
+		for test, result in zip(product([0,1], repeat=self.inputLength), table):
+			self.assertEqual(self.circuit.evaluate(test), result, 'Wrong truth table entry on input %s'%(test,))
+
+	def test_evaluate_with_shared_inputs(self):
+		#the second circuit lists the shared inputs in a different order before the first one is evaluated
+		x = [Input('x'), Input('x')]
+		circuit = Circuit(AndGate(x[0], NotGate(x[1])))
+		Circuit(AndGate(x[1], x[0]))
+		results = [circuit.evaluate(test) for test in product([0,1], repeat=2)]
+		self.assertEqual([0,0,1,0], results, 'wrong evaluation with inputs shared between circuits')
+		self.assertEqual([0,0,1,0], list(circuit.evaluateTruthTable()), 'wrong truth table with inputs shared between circuits')
+
+	def test_mergeDuplicates(self):
+		#x0 & -x1 built twice
+		circuit = Circuit(AndGate(AndGate(self.inputs[0], NotGate(self.inputs[1])), AndGate(NotGate(self.inputs[1]), self.inputs[0])))
+		self.assertEqual(5, circuit.countGates(), 'wrong gate count before merging')
+		self.assertEqual(2, circuit.mergeDuplicates(), 'wrong number of merged gates')
+		self.assertEqual(3, circuit.countGates(), 'wrong gate count after merging')
+		for test in product([0,1], repeat=2):
+			correct = test[0] and not test[1]
+			self.assertEqual(correct, circuit.evaluate(test), 'Wrong evaluation on input %s after merging'%(test,))
+
 	def test_getDependency(self):
 		resultDict = {self.a3.id: set([self.n1.id, self.a2.id]), self.n1.id:set([self.a1.id]), self.a2.id: set([self.n2.id]), self.a1.id: set([]), self.n2.id: set([])}
 		self.assertEqual(resultDict, self.circuit.getDependency(), 'wrong dependency dictionary')
@@ -111,21 +135,9 @@ class TestNotGate(unittest.TestCase):
 		self.input.set(1)
 		self.assertEqual(0, self.gate.evaluate(), 'Wrong evaluation on input [1]. Was %s instead of 0'%self.gate.evaluate())
 
-	@unittest.skip('not important')
-	def test_getDependency(self):
-		# and_gate = AndGate(input1, input2)
-		# self.assertEqual(expected, and_gate.getDependency())
-		assert False # TODO: implement your test here
-
 	def test_getDepth(self):
 		self.assertEqual(1, self.gate.getDepth())
 
-	@unittest.skip('not important')
-	def test_getDict(self):
-		# and_gate = AndGate(input1, input2)
-		# self.assertEqual(expected, and_gate.getDict())
-		assert False # TODO: implement your test here
-
 	def test_getInputs(self):
 		self.assertEqual([self.input], self.gate.getInputs(), 'getInputs result not identical to initial inputs')
 
@@ -159,26 +171,13 @@ class TestAndGate(unittest.TestCase):
 		self.assertEqual(1, self.gate.countGates(1), 'countGates with type 1 incorrect')
 
 	def test_evaluate(self):
-		for test in list(product([0,1], repeat=self.inputLength)):
-			test = list(test)
+		for test in product([0,1], repeat=self.inputLength):
 			correct = (test[0] and test[1])
 			self.assertEqual(correct, self.circuit.evaluate(test), 'Wrong evaluation on input %s. Was %s instead of %s'%(test, self.circuit.evaluate(test), correct))
 
-	@unittest.skip('not important')
-	def test_getDependency(self):
-		# and_gate = AndGate(input1, input2)
-		# self.assertEqual(expected, and_gate.getDependency())
-		assert False # TODO: implement your test here
-
 	def test_getDepth(self):
 		self.assertEqual(1, self.gate.getDepth())
 
-	@unittest.skip('not important')
-	def test_getDict(self):
-		# and_gate = AndGate(input1, input2)
-		# self.assertEqual(expected, and_gate.getDict())
-		assert False # TODO: implement your test here
-
 	def test_getInputs(self):
 		self.assertEqual(self.inputs, self.gate.getInputs(), 'getInputs result not identical to initial inputs')
 
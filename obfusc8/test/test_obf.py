@@ -9,45 +9,46 @@ from obfusc8.rbp import RandomizedBranchingProgram
 from obfusc8.obf import *
 
 class TestFixBP(unittest.TestCase):
-	def setUp(self):
-		self.inputLength = 2
+	@classmethod
+	def setUpClass(cls):
+		cls.inputLength = 2
 		outputLength = 1
 		numberOfGates = 2
-		inputs = [Input("x"+str(x)) for x in range(0, self.inputLength)]
+		inputs = [Input("x"+str(x)) for x in range(0, cls.inputLength)]
 		
 		# (-(x0 & x1) & (-x2 & x3)) & ((x4 & x5) & -(x6 & -x7))
-		self.circuit = Circuit(NotGate(AndGate(inputs[0], inputs[1])))
+		cls.circuit = Circuit(NotGate(AndGate(inputs[0], inputs[1])))
 		
-		uc = UniversalCircuit(self.inputLength, outputLength, numberOfGates)
+		uc = UniversalCircuit(cls.inputLength, outputLength, numberOfGates)
 		bp = BranchingProgram.fromCircuit(uc)
 		
-		self.fixedBP = fixBP(bp, self.circuit)
+		cls.fixedBP = fixBP(bp, cls.circuit)
 	
 	def test_fixed_bp_same_functionality(self):
-		for test in list(product([0,1], repeat=self.inputLength)):
-			test = list(test)
-			circuitResult = self.circuit.evaluate(test)
-			bpResult = self.fixedBP.evaluate(test)
+		tests = list(product([0,1], repeat=self.inputLength))
+		circuitResults = list(self.circuit.evaluateTruthTable())
+		bpResults = self.fixedBP.evaluateBatch(tests).tolist()
+		for test, circuitResult, bpResult in zip(tests, circuitResults, bpResults):
 			self.assertEqual(circuitResult, bpResult, 'Wrong evaluation on input %s. Was %s instead of %s'%(test, circuitResult, bpResult))
 
 class TestFixRBP(unittest.TestCase):
-	def setUp(self):
-		self.inputLength = 2
+	@classmethod
+	def setUpClass(cls):
+		cls.inputLength = 2
 		outputLength = 1
 		numberOfGates = 1
-		inputs = [Input("x"+str(x)) for x in range(0, self.inputLength)]
+		inputs = [Input("x"+str(x)) for x in range(0, cls.inputLength)]
 		
 		# (-(x0 & x1) & (-x2 & x3)) & ((x4 & x5) & -(x6 & -x7))
-		self.circuit = Circuit(AndGate(inputs[0], inputs[1]))
+		cls.circuit = Circuit(AndGate(inputs[0], inputs[1]))
 		
-		uc = UniversalCircuit(self.inputLength, outputLength, numberOfGates)
+		uc = UniversalCircuit(cls.inputLength, outputLength, numberOfGates)
 		rbp = RandomizedBranchingProgram.fromCircuit(uc, 1049, rndMatSize=1)
 		
-		self.fixedRBP = fixRBP(rbp, self.circuit)
+		cls.fixedRBP = fixRBP(rbp, cls.circuit)
 
 	def test_fixed_rbp_same_functionality(self):
-		for test in list(product([0,1], repeat=self.inputLength)):
-			test = list(test)
+		for test in product([0,1], repeat=self.inputLength):
 			correct = self.circuit.evaluate(test)
 			rbpResult = self.fixedRBP.evaluate(test)
 			self.assertEqual(correct, rbpResult, 'Wrong evaluation on input %s. Was %s instead of %s'%(test, rbpResult, correct))
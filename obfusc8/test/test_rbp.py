@@ -1,6 +1,6 @@
 import unittest
 from itertools import product
-from operator import mul
+import numpy
 
 from obfusc8.circuit import *
 from obfusc8.rbp import *
@@ -10,15 +10,18 @@ from obfusc8.rbp import _generateRs, _generateAlphas, _generateVectors
 
 class TestRandomizedBranchingProgram(unittest.TestCase):
 
-	def setUp(self):
-		self.inputLength = 4
-		inputs = [Input('x') for _ in range(0, self.inputLength)]
-		self.crc = Circuit(AndGate(NotGate(AndGate(inputs[0], inputs[1])), AndGate(NotGate(inputs[2]), inputs[3])))
-		self.rbp = RandomizedBranchingProgram.fromCircuit(self.crc, 1049)
+	@classmethod
+	def setUpClass(cls):
+		#pin both random sources used by the randomization (Sage and numpy) so the shared rbp is reproducible
+		set_random_seed(0)
+		numpy.random.seed(0)
+		cls.inputLength = 4
+		inputs = [Input('x') for _ in range(0, cls.inputLength)]
+		cls.crc = Circuit(AndGate(NotGate(AndGate(inputs[0], inputs[1])), AndGate(NotGate(inputs[2]), inputs[3])))
+		cls.rbp = RandomizedBranchingProgram.fromCircuit(cls.crc, 1049)
 
 	def test_rbp_evaluates_equal_to_circuit(self):
-		for test in list(product([0,1], repeat=self.inputLength)):
-			test = list(test)
+		for test in product([0,1], repeat=self.inputLength):
 			correct = self.crc.evaluate(test)
 			rbpResult = self.rbp.evaluate(test)
 			self.assertEqual(correct, rbpResult, 'Wrong evaluation on input %s. Was %s instead of %s'%(test, rbpResult, correct))
@@ -32,10 +35,14 @@ class TestGenerateRs(unittest.TestCase):
 
 	def test_generateRs_constraints(self):
 		rGen = _generateRs(self.ring, self.m)
-		fullList = [mat for _ in range(self.testListLength) for mat in rGen.next()]
-		reduced = reduce(mul, fullList)
-		shortcut = fullList[0]*fullList[-1]
-		self.assertEqual(reduced, shortcut, 'Constraint on _generateRs does not hold. \nfullList: %s \nReduced: %s, Shortcut: %s'%(fullList, reduced, shortcut))
+		#the inverse handed out in each round has to cancel out the matrix of the next round, checked as they are generated
+		identity = identity_matrix(self.ring, 2*self.m+5)
+		previousInv = rGen.next()[1]
+		for step in range(1, self.testListLength):
+			current, currentInv = rGen.next()
+			product = previousInv*current
+			self.assertEqual(product, identity, 'Constraint on _generateRs does not hold in round %d. \nInverse: %s \nMatrix: %s, Product: %s'%(step, previousInv, current, product))
+			previousInv = currentInv
 
 class TestGenerateAlphas(unittest.TestCase):
 
@@ -51,13 +58,15 @@ class TestGenerateAlphas(unittest.TestCase):
 			#generate indexList at random
 			indexList = [ints.random_element(self.indexListMax) for _ in range(self.indexListLength)]
 			a, aP = _generateAlphas(len(indexList), indexList, self.ring)
-			for i in range(max(indexList) + 1):
-				aF = [alpha for alpha, index in zip(a, indexList) if index == i]
-				aPF = [alpha for alpha, index in zip(aP, indexList) if index == i]
-				productAF = reduce(mul, aF, self.ring(1))
-				productAPF = reduce(mul, aPF, self.ring(1))
-				self.assertEqual(productAF, productAPF, 
-					'Product of alphas not equal for index %d. First product: %d, second product: %d'%(i, productAF, productAPF))
+			#products of the alphas per index, gathered in a single pass
+			productsA = {}
+			productsAP = {}
+			for alpha, alphaP, index in zip(a, aP, indexList):
+				productsA[index] = productsA.get(index, self.ring(1)) * alpha
+				productsAP[index] = productsAP.get(index, self.ring(1)) * alphaP
+			for i in productsA:
+				self.assertEqual(productsA[i], productsAP[i], 
+					'Product of alphas not equal for index %d. First product: %d, second product: %d'%(i, productsA[i], productsAP[i]))
 	
 class TestGenerateVectors(unittest.TestCase):
 
@@ -66,11 +75,12 @@ class TestGenerateVectors(unittest.TestCase):
 		self.ring = Integers(random_prime(1000, lbound=71))
 		
 	def test__generateVectors_constraints(self):
-		for _ in range(self.repetitions):
-			sS, tS, sPS, tPS = _generateVectors(self.ring)
-			#compute scalar product
-			productS = sum([a*b for a, b in zip(sS, tS)])
-			productPS = sum([a*b for a, b in zip(sPS, tPS)])
+		#(repetitions, 4, 5) array of the residues of s*, t*, s'*, t'*, the scalar products of all repetitions are computed at once
+		vectors = numpy.array([[map(int, vector) for vector in _generateVectors(self.ring)] for _ in range(self.repetitions)], dtype=numpy.int64)
+		p = int(self.ring.order())
+		productsS = (vectors[:, 0]*vectors[:, 1]).sum(axis=1) % p
+		productsPS = (vectors[:, 2]*vectors[:, 3]).sum(axis=1) % p
+		for productS, productPS in zip(productsS.tolist(), productsPS.tolist()):
 			self.assertEqual(productS, productPS, 'Generate vectors do not heed constraint. ProductS: %d, productSP: %d'%(productS, productPS))
 
 if __name__ == '__main__':
@@ -1,6 +1,6 @@
 #lang C
 #clib gghlite
-#cargs -std=c99
+#cargs -std=c99 -O3 -funroll-loops
 
 ### necessary when using setup.py? ###
 